@@ -1,21 +1,42 @@
+import atexit
+import base64
+import binascii
+import heapq
 import json
 import math
 import os
+import queue
 import random
 import sqlite3
 import string
+import sys
+import threading
 import time
-from datetime import datetime
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 
-from flask import Flask, jsonify, render_template, request, send_from_directory
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import redis
+except ImportError:  # yalnızca ROOM_STORE_URL=redis://... için gerekli
+    redis = None
+
+from flask import Flask, g, has_app_context, jsonify, render_template, request, send_from_directory
 from flask_socketio import SocketIO, emit, join_room, leave_room
 
 # ------------------------------------------------------------
 # Flask uygulama ayarları
 # ------------------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "brain_speed.db"
+DB_PATH = Path(os.environ.get("BRAIN_SPEED_DB", BASE_DIR / "brain_speed.db"))
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "brain-speed-secret")
@@ -27,15 +48,18 @@ socketio = SocketIO(
     async_mode="threading",
     ping_timeout=30,
     ping_interval=10,
+    # Birden çok worker için ör. redis://localhost:6379/0; yayınlar tüm
+    # süreçlere bu kuyruk üzerinden dağıtılır.
+    message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE") or None,
 )
 
 
 # ------------------------------------------------------------
 # Yardımcı veri yapıları
 # ------------------------------------------------------------
+# sid -> {"username", "room"}; socket bağlantıları sürece özel olduğundan
+# yereldir. Oda ve maç durumu `ROOM_STORE` içinde tutulur.
 ONLINE_USERS = {}
-ROOMS = {}
-ACTIVE_MATCHES = {}
 
 BRAIN_TYPES = [
     "Hızlı Düşünür",
@@ -50,12 +74,198 @@ COUNTRIES = ["TR", "US", "DE", "FR", "GB", "JP", "KR", "BR", "ES", "IT"]
 # ------------------------------------------------------------
 # DB yardımcıları
 # ------------------------------------------------------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """Pragmaları bir kez uygulanmış kalıcı SQLite bağlantıları havuzu.
+
+    Bağlantılar thread'ler arasında sırayla paylaşılır (aynı anda tek
+    sahip). `cached_statements` sayesinde aynı SQL metinleri bağlantı
+    yaşadıkça hazır (prepared) kalır. Havuz doluysa geçici bir bağlantı
+    açılır ve iade edilince kapatılır.
+    """
+
+    def __init__(self, size: int = DB_POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(DB_PATH, timeout=5, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+DB_POOL = ConnectionPool()
+_thread_conns = threading.local()
+atexit.register(DB_POOL.close_all)
+
+
+def get_conn() -> sqlite3.Connection:
+    """Aktif istek / socket event'i boyunca aynı havuz bağlantısını döndürür.
+
+    Bağlantı `teardown_appcontext` ile havuza iade edilir; çağıranlar
+    kapatmamalıdır. App context dışında thread'e özel bir bağlantı kullanılır.
+    """
+    if has_app_context():
+        conn = g.get("db_conn")
+        if conn is None:
+            conn = g.db_conn = DB_POOL.acquire()
+        return conn
+    conn = getattr(_thread_conns, "conn", None)
+    if conn is None:
+        conn = _thread_conns.conn = DB_POOL.acquire()
     return conn
 
 
+@app.teardown_appcontext
+def release_conn(_exc) -> None:
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        DB_POOL.release(conn)
+
+
+# Skor eklendiğinde aynı transaction içinde trigger'larla güncellenen
+# materyalize leaderboard tabloları. Okumalar geçmiş boyutundan bağımsız
+# olarak O(limit) kalır.
+LEADERBOARD_SCHEMA = """
+-- Keyset sayfalama için kapsayan index: sıralama ve liste kolonları
+-- index'ten okunur, tabloya yalnızca users join'i için gidilmez.
+CREATE INDEX IF NOT EXISTS idx_scores_keyset ON scores(
+    score DESC, avg_reaction_ms ASC, id, user_id, brain_type, percentile, created_at
+);
+CREATE INDEX IF NOT EXISTS idx_scores_user_best ON scores(user_id, score DESC, avg_reaction_ms ASC);
+
+CREATE TABLE IF NOT EXISTS country_best (
+    country TEXT PRIMARY KEY,
+    top_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_country_best_score ON country_best(top_score DESC);
+
+CREATE TABLE IF NOT EXISTS test_type_best (
+    test_type TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    score_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    avg_reaction_ms REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (test_type, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_test_type_best_rank
+    ON test_type_best(test_type, score DESC, avg_reaction_ms ASC);
+
+-- period: 'daily' | 'weekly'; period_start: günün / haftanın (Pazartesi) tarihi
+CREATE TABLE IF NOT EXISTS period_best (
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    score_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    avg_reaction_ms REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (period, period_start, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_period_best_rank
+    ON period_best(period, period_start, score DESC, avg_reaction_ms ASC);
+
+CREATE TRIGGER IF NOT EXISTS trg_scores_leaderboards AFTER INSERT ON scores
+BEGIN
+    INSERT INTO country_best (country, top_score)
+    SELECT country, NEW.score FROM users WHERE id = NEW.user_id AND country IS NOT NULL
+    ON CONFLICT(country) DO UPDATE SET top_score = MAX(top_score, excluded.top_score);
+
+    INSERT INTO test_type_best (test_type, user_id, score_id, score, avg_reaction_ms, created_at)
+    VALUES (NEW.test_type, NEW.user_id, NEW.id, NEW.score, NEW.avg_reaction_ms, NEW.created_at)
+    ON CONFLICT(test_type, user_id) DO UPDATE SET
+        score_id = excluded.score_id, score = excluded.score,
+        avg_reaction_ms = excluded.avg_reaction_ms, created_at = excluded.created_at
+    WHERE excluded.score > score
+       OR (excluded.score = score AND excluded.avg_reaction_ms < avg_reaction_ms);
+
+    INSERT INTO period_best (period, period_start, user_id, score_id, score, avg_reaction_ms, created_at)
+    VALUES
+        ('daily', date(NEW.created_at), NEW.user_id, NEW.id, NEW.score, NEW.avg_reaction_ms, NEW.created_at),
+        ('weekly', date(NEW.created_at, '-6 days', 'weekday 1'), NEW.user_id, NEW.id, NEW.score,
+         NEW.avg_reaction_ms, NEW.created_at)
+    ON CONFLICT(period, period_start, user_id) DO UPDATE SET
+        score_id = excluded.score_id, score = excluded.score,
+        avg_reaction_ms = excluded.avg_reaction_ms, created_at = excluded.created_at
+    WHERE excluded.score > score
+       OR (excluded.score = score AND excluded.avg_reaction_ms < avg_reaction_ms);
+END;
+"""
+
+LEADERBOARD_BACKFILL = """
+INSERT OR REPLACE INTO country_best (country, top_score)
+SELECT u.country, MAX(s.score) FROM scores s JOIN users u ON u.id = s.user_id
+WHERE u.country IS NOT NULL GROUP BY u.country;
+
+INSERT OR REPLACE INTO test_type_best (test_type, user_id, score_id, score, avg_reaction_ms, created_at)
+SELECT test_type, user_id, id, score, avg_reaction_ms, created_at FROM (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY test_type, user_id ORDER BY score DESC, avg_reaction_ms ASC
+    ) AS rn FROM scores
+) WHERE rn = 1;
+
+INSERT OR REPLACE INTO period_best (period, period_start, user_id, score_id, score, avg_reaction_ms, created_at)
+SELECT period, period_start, user_id, id, score, avg_reaction_ms, created_at FROM (
+    SELECT p.period, p.period_start, s.*, ROW_NUMBER() OVER (
+        PARTITION BY p.period, p.period_start, s.user_id ORDER BY s.score DESC, s.avg_reaction_ms ASC
+    ) AS rn
+    FROM (
+        SELECT 'daily' AS period, date(created_at) AS period_start, id FROM scores
+        UNION ALL
+        SELECT 'weekly', date(created_at, '-6 days', 'weekday 1'), id FROM scores
+    ) p JOIN scores s ON s.id = p.id
+) WHERE rn = 1;
+"""
+
+
+# Saatlik event sayaçları; analytics yazıcısı ham event'lerle aynı batch'te
+# günceller. `hour` = created_at'in ilk 13 karakteri (YYYY-MM-DDTHH).
+ANALYTICS_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_analytics_created_at ON analytics(created_at);
+
+CREATE TABLE IF NOT EXISTS analytics_hourly (
+    event_name TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, event_name)
+) WITHOUT ROWID;
+"""
+
+
 def init_db() -> None:
     """İlk açılışta tüm tabloları oluşturur."""
     conn = get_conn()
@@ -81,6 +291,8 @@ def init_db() -> None:
             percentile REAL DEFAULT 0,
             brain_type TEXT,
             details_json TEXT,
+            details_blob BLOB,
+            trial_types BLOB,
             created_at TEXT NOT NULL,
             FOREIGN KEY(user_id) REFERENCES users(id)
         );
@@ -112,9 +324,454 @@ def init_db() -> None:
         );
         """
     )
+    _migrate_score_details(cur)
+    cur.executescript(LEADERBOARD_SCHEMA)
+    cur.executescript(ANALYTICS_SCHEMA)
+
+    has_scores = cur.execute("SELECT 1 FROM scores LIMIT 1").fetchone()
+    is_empty = cur.execute("SELECT 1 FROM country_best LIMIT 1").fetchone() is None
+    if has_scores and is_empty:
+        # Materyalize tablolar sonradan eklendi; geçmişi bir kez doldur.
+        cur.executescript(LEADERBOARD_BACKFILL)
+
+    has_events = cur.execute("SELECT 1 FROM analytics LIMIT 1").fetchone()
+    no_rollup = cur.execute("SELECT 1 FROM analytics_hourly LIMIT 1").fetchone() is None
+    if has_events and no_rollup:
+        cur.execute(
+            """
+            INSERT INTO analytics_hourly (event_name, hour, count)
+            SELECT event_name, substr(created_at, 1, 13), COUNT(*) FROM analytics GROUP BY 1, 2
+            """
+        )
 
     conn.commit()
-    conn.close()
+
+
+def _migrate_score_details(cur: sqlite3.Cursor) -> None:
+    """Eski şemaya paketli detay kolonlarını ekler ve JSON detayları dönüştürür."""
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(scores)")}
+    for name in ("details_blob", "trial_types"):
+        if name not in columns:
+            cur.execute(f"ALTER TABLE scores ADD COLUMN {name} BLOB")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scores_created_at ON scores(created_at)")
+
+    # Satırlar id sırasıyla ve parça başına ayrı transaction'da dönüştürülür;
+    # bozuk satırlar loglanıp atlanır, details_json'ları olduğu gibi kalır.
+    last_id = 0
+    skipped = 0
+    while True:
+        rows = cur.execute(
+            """
+            SELECT id, details_json FROM scores
+            WHERE id > ? AND details_json IS NOT NULL AND details_blob IS NULL
+            ORDER BY id
+            LIMIT ?
+            """,
+            (last_id, DETAILS_MIGRATE_CHUNK),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for score_id, raw in rows:
+            try:
+                details = json.loads(raw)
+                if not isinstance(details, list):
+                    raise ValueError("details_json is not a list")
+                trials, types = pack_details(details)
+            except (TypeError, ValueError, OverflowError) as exc:
+                skipped += 1
+                app.logger.warning("scores.id=%s details_json dönüştürülemedi: %s", score_id, exc)
+                continue
+            updates.append((trials.tobytes(), types.tobytes(), score_id))
+        cur.executemany(
+            "UPDATE scores SET details_blob = ?, trial_types = ?, details_json = NULL WHERE id = ?",
+            updates,
+        )
+        cur.connection.commit()
+    if skipped:
+        app.logger.warning("%d skor satırının details_json'u dönüştürülemedi ve korundu", skipped)
+
+
+# ------------------------------------------------------------
+# Oda durumu deposu
+# ------------------------------------------------------------
+# "memory" (varsayılan, tek süreç), "sqlite:///rooms.db" (aynı makinedeki
+# süreçler / testler) veya "redis://host:6379/0" (çok makine).
+ROOM_STORE_URL = os.environ.get("ROOM_STORE_URL", "memory")
+
+
+def _approx_size(obj, seen: set | None = None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k, seen) + _approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_approx_size(v, seen) for v in obj)
+    return size
+
+
+class LocalRoomStore:
+    """Süreç içi oda deposu; tek worker ve testler için varsayılan.
+
+    Tüm depolar aynı arayüzü sunar: odalar JSON'a çevrilebilir dict'lerdir,
+    değişiklikler `update(code)` bloğu içinde kilit altında yapılır ve blok
+    çıkışında kalıcılaşır. Blok içinde I/O yapılmamalıdır.
+    """
+
+    def __init__(self):
+        self.rooms = {}
+        self.matches = {}
+        self._lock = threading.RLock()
+
+    def get(self, code: str) -> dict | None:
+        return self.rooms.get(code)
+
+    def exists(self, code: str) -> bool:
+        return code in self.rooms
+
+    def create(self, code: str, room: dict) -> bool:
+        with self._lock:
+            if code in self.rooms:
+                return False
+            self.rooms[code] = room
+            return True
+
+    @contextmanager
+    def update(self, code: str):
+        with self._lock:
+            yield self.rooms.get(code)
+
+    def delete(self, code: str) -> dict | None:
+        with self._lock:
+            return self.rooms.pop(code, None)
+
+    def set_match(self, code: str, match: dict) -> None:
+        self.matches[code] = match
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # Tek süreç: her zaman lider.
+        return True
+
+    def pop_match(self, code: str) -> dict | None:
+        return self.matches.pop(code, None)
+
+    def stats(self) -> dict:
+        return {
+            "live": len(self.rooms),
+            "activeMatches": len(self.matches),
+            "stateBytes": _approx_size(self.rooms) + _approx_size(self.matches),
+        }
+
+
+class SQLiteRoomStore:
+    """Oda durumunu ayrı bir SQLite dosyasında JSON olarak tutar.
+
+    Aynı makinedeki birden çok worker'ı ve testleri gerçek bir paylaşımlı
+    depo kurmadan çalıştırmak içindir. `update` bloğu `BEGIN IMMEDIATE`
+    ile süreçler arası kilitlenir. Dosya `brain_speed.db`'den ayrı olmalıdır.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS room_state (code TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS match_state (code TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, code: str) -> dict | None:
+        row = self._conn().execute("SELECT data FROM room_state WHERE code = ?", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, code: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM room_state WHERE code = ?", (code,)).fetchone() is not None
+
+    def create(self, code: str, room: dict) -> bool:
+        try:
+            self._conn().execute("INSERT INTO room_state (code, data) VALUES (?, ?)", (code, json.dumps(room)))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    @contextmanager
+    def update(self, code: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            room = self.get(code)
+            yield room
+            if room is not None:
+                conn.execute("UPDATE room_state SET data = ? WHERE code = ?", (json.dumps(room), code))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, code: str) -> dict | None:
+        row = self._conn().execute("DELETE FROM room_state WHERE code = ? RETURNING data", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_match(self, code: str, match: dict) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO match_state (code, data) VALUES (?, ?)", (code, json.dumps(match))
+        )
+
+    def pop_match(self, code: str) -> dict | None:
+        conn = self._conn()
+        row = conn.execute("DELETE FROM match_state WHERE code = ? RETURNING data", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Lease boşsa, süresi dolmuşsa ya da zaten `owner`'daysa alır / uzatır."""
+        now = time.time()
+        row = self._conn().execute(
+            """
+            INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+            WHERE leases.owner = excluded.owner OR leases.expires < ?
+            RETURNING owner
+            """,
+            (name, owner, now + ttl, now),
+        ).fetchone()
+        return row is not None
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        return {
+            "live": conn.execute("SELECT COUNT(*) FROM room_state").fetchone()[0],
+            "activeMatches": conn.execute("SELECT COUNT(*) FROM match_state").fetchone()[0],
+        }
+
+
+# Lease `owner`'daysa uzatır, boşsa alır; tek adımda (atomik) çalışır.
+_REDIS_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
+class RedisRoomStore:
+    """Odaları Redis'te tutar; N süreç / makine aynı odaları görür.
+
+    `update` bloğu oda başına bir Redis kilidi altında çalışır.
+    """
+
+    def __init__(self, url: str, prefix: str = "brain_speed"):
+        if redis is None:
+            raise RuntimeError("ROOM_STORE_URL=redis://... için `pip install redis` gerekli")
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, kind: str, code: str) -> str:
+        return f"{self.prefix}:{kind}:{code}"
+
+    def get(self, code: str) -> dict | None:
+        data = self._redis.get(self._key("room", code))
+        return json.loads(data) if data else None
+
+    def exists(self, code: str) -> bool:
+        return bool(self._redis.exists(self._key("room", code)))
+
+    def create(self, code: str, room: dict) -> bool:
+        if not self._redis.set(self._key("room", code), json.dumps(room), nx=True):
+            return False
+        self._redis.sadd(f"{self.prefix}:rooms", code)
+        return True
+
+    @contextmanager
+    def update(self, code: str):
+        with self._redis.lock(self._key("lock", code), timeout=10, blocking_timeout=5):
+            room = self.get(code)
+            yield room
+            # Blok içinde silinen oda yeniden yazılmamalı.
+            if room is not None and self.exists(code):
+                self._redis.set(self._key("room", code), json.dumps(room))
+
+    def delete(self, code: str) -> dict | None:
+        pipe = self._redis.pipeline()
+        pipe.get(self._key("room", code))
+        pipe.delete(self._key("room", code))
+        pipe.srem(f"{self.prefix}:rooms", code)
+        data = pipe.execute()[0]
+        return json.loads(data) if data else None
+
+    def set_match(self, code: str, match: dict) -> None:
+        self._redis.set(self._key("match", code), json.dumps(match))
+        self._redis.sadd(f"{self.prefix}:matches", code)
+
+    def pop_match(self, code: str) -> dict | None:
+        pipe = self._redis.pipeline()
+        pipe.get(self._key("match", code))
+        pipe.delete(self._key("match", code))
+        pipe.srem(f"{self.prefix}:matches", code)
+        data = pipe.execute()[0]
+        return json.loads(data) if data else None
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._redis.eval(_REDIS_LEASE_SCRIPT, 1, self._key("lease", name), owner, int(ttl * 1000)))
+
+    def stats(self) -> dict:
+        return {
+            "live": self._redis.scard(f"{self.prefix}:rooms"),
+            "activeMatches": self._redis.scard(f"{self.prefix}:matches"),
+        }
+
+
+def create_room_store(url: str):
+    if url.startswith(("redis://", "rediss://")):
+        return RedisRoomStore(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteRoomStore(url[len("sqlite:///"):])
+    return LocalRoomStore()
+
+
+ROOM_STORE = create_room_store(ROOM_STORE_URL)
+# Süreçler arası lease sahipliği için bu worker'ın kimliği.
+WORKER_ID = f"{os.getpid()}-{os.urandom(4).hex()}"
+
+
+# ------------------------------------------------------------
+# Percentile motoru
+# ------------------------------------------------------------
+SCORE_MIN = 0.0
+SCORE_MAX = 100.0
+# compute_score 2 ondalığa yuvarladığı için 0.01'lik kovalar kayıpsızdır.
+SCORE_RESOLUTION = 100
+PERCENTILE_SYNC_INTERVAL = float(os.environ.get("PERCENTILE_SYNC_INTERVAL", "1.0"))
+
+
+class ScorePercentileIndex:
+    """Skor dağılımını kovalara ayrılmış bir Fenwick ağacında tutar.
+
+    Açılışta `scores` tablosundan bir kez yüklenir; sonrasında `sync` yalnızca
+    `id > son görülen id` satırlarını ekler. Böylece diğer worker'ların
+    yazdığı skorlar da en fazla `sync_interval` saniye gecikmeyle sayılır.
+    `score <= x` sayımı tablo taraması yerine O(log n) yapılır.
+    """
+
+    def __init__(
+        self,
+        min_value: float = SCORE_MIN,
+        max_value: float = SCORE_MAX,
+        resolution: int = SCORE_RESOLUTION,
+        sync_interval: float = PERCENTILE_SYNC_INTERVAL,
+    ):
+        self.min_value = min_value
+        self.sync_interval = sync_interval
+        self.resolution = resolution
+        self.size = int(round((max_value - min_value) * resolution)) + 1
+        self._tree = [0] * (self.size + 1)
+        self._total = 0
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _bucket(self, score: float) -> int:
+        idx = int(round((score - self.min_value) * self.resolution))
+        return max(0, min(self.size - 1, idx))
+
+    def ensure_loaded(self) -> None:
+        self.sync()
+
+    def sync(self, force: bool = False) -> None:
+        """Son senkrondan beri eklenen skorları (tüm worker'lardan) ağaca ekler.
+
+        `force` kendi insert'imizden hemen sonra kullanılır; aksi halde en
+        fazla `sync_interval` saniyede bir DB'ye bakılır.
+        """
+        if self._loaded and not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            conn = get_conn()
+            if not self._loaded:
+                self._build(conn.execute("SELECT id, score FROM scores"))
+            else:
+                for score_id, score in conn.execute(
+                    "SELECT id, score FROM scores WHERE id > ? ORDER BY id", (self._last_id,)
+                ):
+                    self._add(score)
+                    self._last_id = score_id
+            self._synced_at = time.monotonic()
+
+    def _build(self, rows) -> None:
+        tree = [0] * (self.size + 1)
+        total = 0
+        last_id = 0
+        for score_id, score in rows:
+            tree[self._bucket(score) + 1] += 1
+            total += 1
+            last_id = max(last_id, score_id)
+        # Frekans dizisinden O(n) Fenwick kurulumu.
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._total = total
+        self._last_id = last_id
+        self._loaded = True
+
+    def _add(self, score: float) -> None:
+        self._total += 1
+        i = self._bucket(score) + 1
+        while i <= self.size:
+            self._tree[i] += 1
+            i += i & -i
+
+    def _count_le(self, score: float) -> int:
+        i = self._bucket(score) + 1
+        acc = 0
+        while i > 0:
+            acc += self._tree[i]
+            i -= i & -i
+        return acc
+
+    def count_le(self, score: float) -> int:
+        with self._lock:
+            return self._count_le(score)
+
+    def count_gt(self, score: float) -> int:
+        """`score`'dan kesin olarak yüksek skor sayısı (O(log n))."""
+        with self._lock:
+            return self._total - self._count_le(score)
+
+    def total(self) -> int:
+        return self._total
+
+    def percentile(self, score: float) -> float:
+        return self.percentiles([score])[0]
+
+    def percentiles(self, scores: list) -> list:
+        """Tüm skorları aynı anlık dağılıma göre değerlendirir."""
+        with self._lock:
+            if self._total == 0:
+                return [100.0] * len(scores)
+            return [round((self._count_le(score) / self._total) * 100, 2) for score in scores]
+
+
+PERCENTILES = ScorePercentileIndex()
 
 
 # ------------------------------------------------------------
@@ -130,6 +787,105 @@ def normalize(value: float, min_value: float, max_value: float) -> float:
     return max(0.0, min(1.0, (value - min_value) / (max_value - min_value)))
 
 
+# ------------------------------------------------------------
+# Paketli reaksiyon detayları
+# ------------------------------------------------------------
+# Her deneme `details_blob` içinde [reactionMs, accuracy] çifti olarak
+# little-endian float32 (8 bayt) ve `trial_types` içinde uint8 kod (1 bayt)
+# olarak saklanır; JSON'daki ~70 bayt/deneme yerine 9 bayt.
+TRIAL_TYPES = (
+    "unknown", "math", "pattern", "memory", "stroop", "sequence",
+    "odd", "compare", "spatial", "dual", "reaction",
+)
+TRIAL_TYPE_CODES = {name: code for code, name in enumerate(TRIAL_TYPES)}
+DETAIL_DTYPE = np.dtype("<f4")
+DETAILS_MIGRATE_CHUNK = 1000
+REACTION_STATS_CHUNK = 2000
+REACTION_STATS_MAX_DAYS = 90
+
+
+def pack_details(details: list) -> tuple:
+    """Deneme listesini (n, 2) float32 matris ve uint8 tip dizisine çevirir."""
+    trials = np.empty((len(details), 2), dtype=DETAIL_DTYPE)
+    types = np.zeros(len(details), dtype=np.uint8)
+    for i, item in enumerate(details):
+        item = item if isinstance(item, dict) else {}
+        trials[i, 0] = float(item.get("reactionMs", 800))
+        trials[i, 1] = float(item.get("accuracy", 0))
+        types[i] = TRIAL_TYPE_CODES.get(item.get("testType"), 0)
+    return trials, types
+
+
+def unpack_details(blob: bytes | None) -> np.ndarray:
+    if not blob:
+        return np.empty((0, 2), dtype=DETAIL_DTYPE)
+    return np.frombuffer(blob, dtype=DETAIL_DTYPE).reshape(-1, 2)
+
+
+class RunningStats:
+    """Welford/Chan yöntemiyle akan ortalama ve varyans.
+
+    Değerler tek tek (`push`) ya da numpy dizileri hâlinde (`extend`)
+    eklenebilir; iki özet `merge` ile birleştirilir. Hiçbir değer bellekte
+    tutulmaz.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def extend(self, values: np.ndarray) -> None:
+        if values.size == 0:
+            return
+        values = values.astype(np.float64, copy=False)
+        batch = RunningStats()
+        batch.count = int(values.size)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "std": round(math.sqrt(self.variance), 2),
+            "min": round(self.min, 2),
+            "max": round(self.max, 2),
+        }
+
+
 def compute_score(accuracy: float, avg_reaction_ms: float) -> float:
     """Skor = (Doğruluk x 80) + (Hız x 20)."""
     speed = 1.0 - normalize(avg_reaction_ms, 120, 1500)
@@ -137,14 +893,19 @@ def compute_score(accuracy: float, avg_reaction_ms: float) -> float:
     return round(weighted, 2)
 
 
-def infer_brain_type(test_results: list) -> str:
-    """Test sonuç desenine göre beyin tipi döndürür."""
-    if not test_results:
+def infer_brain_type(trials: np.ndarray) -> str:
+    """Test sonuç desenine göre beyin tipi döndürür.
+
+    `trials`, `pack_details` çıktısı olan (n, 2) [reactionMs, accuracy] matrisidir.
+    """
+    if len(trials) == 0:
         return "Dengeli Zihin"
 
-    avg_acc = sum(x.get("accuracy", 0) for x in test_results) / len(test_results)
-    avg_ms = sum(x.get("reactionMs", 800) for x in test_results) / len(test_results)
-    variance = _variance([x.get("reactionMs", 800) for x in test_results])
+    reaction = RunningStats()
+    reaction.extend(trials[:, 0])
+    avg_acc = float(trials[:, 1].mean())
+    avg_ms = reaction.mean
+    variance = reaction.variance
 
     if avg_ms < 320 and avg_acc > 0.7:
         return "Hızlı Düşünür"
@@ -155,56 +916,252 @@ def infer_brain_type(test_results: list) -> str:
     return "Dengeli Zihin"
 
 
-def _variance(values: list) -> float:
-    if not values:
-        return 0.0
-    m = sum(values) / len(values)
-    return sum((v - m) ** 2 for v in values) / len(values)
+def calculate_percentile(score: float) -> float:
+    """Skorun mevcut dağılımdaki yüzdelik dilimini döndürür (O(log n))."""
+    PERCENTILES.ensure_loaded()
+    return PERCENTILES.percentile(score)
 
 
-def calculate_percentile(score: float) -> float:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) as c FROM scores")
-    total = cur.fetchone()["c"]
-    if total == 0:
-        conn.close()
-        return 100.0
+# ------------------------------------------------------------
+# Kullanıcı id çözümleme
+# ------------------------------------------------------------
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "50000"))
+# SQLite'ın bağlı parametre sınırının güvenle altında.
+USER_LOOKUP_CHUNK = 500
 
-    cur.execute("SELECT COUNT(*) as c FROM scores WHERE score <= ?", (score,))
-    lower_or_equal = cur.fetchone()["c"]
-    conn.close()
-    percentile = (lower_or_equal / total) * 100
-    return round(percentile, 2)
 
+class UserIdCache:
+    """username -> user_id için sınırlı LRU önbellek.
+
+    Kullanıcılar silinmediği ve id'leri değişmediği için önbellek yalnızca
+    insert sonrası doldurulur; geçersiz kılma gerekmez (süreçler arası da).
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> int | None:
+        with self._lock:
+            user_id = self._items.get(username)
+            if user_id is not None:
+                self._items.move_to_end(username)
+            return user_id
+
+    def put(self, username: str, user_id: int) -> None:
+        with self._lock:
+            self._items[username] = user_id
+            self._items.move_to_end(username)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+USER_IDS = UserIdCache()
+
+
+def _select_user_ids(conn: sqlite3.Connection, usernames: list) -> dict:
+    found = {}
+    for i in range(0, len(usernames), USER_LOOKUP_CHUNK):
+        chunk = usernames[i : i + USER_LOOKUP_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT username, id FROM users WHERE username IN ({marks})", chunk):
+            found[row["username"]] = row["id"]
+    return found
+
+
+def _profile(profiles: dict | None, username: str, country: str, lang: str) -> tuple:
+    return (profiles or {}).get(username, (country, lang))
+
+
+def resolve_users(usernames, country: str = "TR", lang: str = "tr", profiles: dict | None = None) -> dict:
+    """Kullanıcı adlarını id'lere çevirir; eksikleri tek sorgu + tek insert ile tamamlar.
+
+    `profiles` (username -> (country, lang)) yeni oluşturulan kullanıcıların
+    ülke / dilini ad bazında belirler; olmayanlar `country` / `lang` alır.
+    """
+    resolved = {}
+    missing = []
+    for username in dict.fromkeys(usernames):
+        user_id = USER_IDS.get(username)
+        if user_id is None:
+            missing.append(username)
+        else:
+            resolved[username] = user_id
+    if not missing:
+        return resolved
 
-def ensure_user(username: str, country: str = "TR", lang: str = "tr") -> int:
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM users WHERE username = ?", (username,))
-    row = cur.fetchone()
-    if row:
-        user_id = row["id"]
-    else:
-        cur.execute(
-            "INSERT INTO users (username, country, created_at, preferred_lang) VALUES (?, ?, ?, ?)",
-            (username, country, now_iso(), lang),
+    found = _select_user_ids(conn, missing)
+    new = [u for u in missing if u not in found]
+    if new:
+        now = now_iso()
+        # OR IGNORE: başka bir istek / süreç aynı adı araya girip eklemiş olabilir.
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (username, country, preferred_lang, created_at) VALUES (?, ?, ?, ?)",
+            [(u, *_profile(profiles, u, country, lang), now) for u in new],
         )
-        user_id = cur.lastrowid
         conn.commit()
-    conn.close()
-    return user_id
+        found.update(_select_user_ids(conn, new))
+
+    for username, user_id in found.items():
+        USER_IDS.put(username, user_id)
+        resolved[username] = user_id
+    return resolved
+
+
+def ensure_user(username: str, country: str = "TR", lang: str = "tr") -> int:
+    user_id = USER_IDS.get(username)
+    if user_id is not None:
+        return user_id
+    return resolve_users([username], country=country, lang=lang)[username]
+
+
+# ------------------------------------------------------------
+# Analytics yazıcısı (write-behind)
+# ------------------------------------------------------------
+ANALYTICS_QUEUE_SIZE = int(os.environ.get("ANALYTICS_QUEUE_SIZE", "10000"))
+ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE", "500"))
+ANALYTICS_LINGER = float(os.environ.get("ANALYTICS_LINGER", "0.2"))
+ANALYTICS_RETENTION_DAYS = float(os.environ.get("ANALYTICS_RETENTION_DAYS", "30"))
+ANALYTICS_COMPACT_INTERVAL = float(os.environ.get("ANALYTICS_COMPACT_INTERVAL", "3600"))
+ANALYTICS_COMPACT_CHUNK = 5000
+
+
+class AnalyticsWriter:
+    """`analytics` satırlarını ve saatlik sayaçları ayrı bir thread'de toplu yazar."""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        maxsize: int = ANALYTICS_QUEUE_SIZE,
+        batch_size: int = ANALYTICS_BATCH_SIZE,
+        linger: float = ANALYTICS_LINGER,
+    ):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._compacted_at = 0.0
+
+    def submit(self, row: tuple) -> None:
+        # Kuyruk doluysa event düşürülür ve sayılır; istek asla beklemez.
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self) -> None:
+        """Kuyruktaki tüm event'ler yazılana kadar bekler."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        conn = DB_POOL.acquire()
+        try:
+            while True:
+                self._maybe_compact(conn)
+                try:
+                    batch = [self._queue.get(timeout=ANALYTICS_COMPACT_INTERVAL)]
+                except queue.Empty:
+                    continue
+                if batch[0] is not self._STOP and self.linger:
+                    time.sleep(self.linger)
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                rows = [item for item in batch if item is not self._STOP]
+                if rows:
+                    self._write(conn, rows)
+                for _ in batch:
+                    self._queue.task_done()
+                if len(rows) != len(batch):
+                    return
+        finally:
+            DB_POOL.release(conn)
+
+    def _write(self, conn: sqlite3.Connection, rows: list) -> None:
+        try:
+            hourly = Counter((name, created_at[:13]) for name, _, created_at in rows)
+            with conn:
+                conn.executemany(
+                    "INSERT INTO analytics (event_name, payload_json, created_at) VALUES (?, ?, ?)",
+                    rows,
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO analytics_hourly (event_name, hour, count) VALUES (?, ?, ?)
+                    ON CONFLICT(hour, event_name) DO UPDATE SET count = count + excluded.count
+                    """,
+                    [(name, hour, count) for (name, hour), count in hourly.items()],
+                )
+        except sqlite3.Error:
+            app.logger.exception("analytics yazımı başarısız; %d event düşürüldü", len(rows))
+            with self._lock:
+                self.errors += 1
+                self.dropped += len(rows)
+            return
+        self.written += len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self._queue.qsize(),
+        }
+
+    def _maybe_compact(self, conn: sqlite3.Connection) -> None:
+        # Saklama süresini aşan ham event'ler parça parça silinir; sayımlar rollup'ta kalır.
+        if time.monotonic() - self._compacted_at < ANALYTICS_COMPACT_INTERVAL:
+            return
+        self._compacted_at = time.monotonic()
+        cutoff = (datetime.utcnow() - timedelta(days=ANALYTICS_RETENTION_DAYS)).isoformat(timespec="seconds")
+        try:
+            while True:
+                with conn:
+                    deleted = conn.execute(
+                        "DELETE FROM analytics WHERE id IN "
+                        "(SELECT id FROM analytics WHERE created_at < ? LIMIT ?)",
+                        (cutoff, ANALYTICS_COMPACT_CHUNK),
+                    ).rowcount
+                if deleted < ANALYTICS_COMPACT_CHUNK:
+                    break
+        except sqlite3.Error:
+            app.logger.exception("analytics sıkıştırma başarısız")
+
+
+ANALYTICS = AnalyticsWriter()
+atexit.register(ANALYTICS.close)
 
 
 def track_event(event_name: str, payload: dict | None = None) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO analytics (event_name, payload_json, created_at) VALUES (?, ?, ?)",
-        (event_name, json.dumps(payload or {}), now_iso()),
-    )
-    conn.commit()
-    conn.close()
+    """Analytics event'ini arka plan yazıcısının kuyruğuna bırakır."""
+    ANALYTICS.submit((event_name, json.dumps(payload or {}), now_iso()))
 
 
 # ------------------------------------------------------------
@@ -225,86 +1182,311 @@ def service_worker():
     return send_from_directory(BASE_DIR / "static", "service-worker.js")
 
 
-@app.post("/api/submit_score")
-def submit_score():
-    data = request.get_json(silent=True) or {}
-    username = data.get("username", "guest")[:32]
-    country = data.get("country", "TR")
-    lang = data.get("lang", "tr")
-    test_type = data.get("testType", "mixed")
+SCORE_INSERT_SQL = """
+    INSERT INTO scores (
+        user_id, test_type, accuracy, avg_reaction_ms, score, percentile,
+        brain_type, details_blob, trial_types, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+MAX_BATCH_RESULTS = 200
+
+
+def _parse_result(data: dict, defaults: dict | None = None) -> dict:
+    """Tek bir test sonucunu doğrular ve skor / beyin tipini hesaplar."""
+    data = {**(defaults or {}), **data}
     accuracy = float(data.get("accuracy", 0.0))
     avg_reaction_ms = float(data.get("avgReactionMs", 1000))
+    if not (math.isfinite(accuracy) and math.isfinite(avg_reaction_ms)):
+        raise ValueError("accuracy and avgReactionMs must be finite")
+    # Skor böylece her zaman percentile index aralığında (0-100) kalır.
+    accuracy = max(0.0, min(1.0, accuracy))
     details = data.get("details", [])
+    trials, types = pack_details(details if isinstance(details, list) else [])
+    return {
+        "username": data.get("username", "guest")[:32],
+        "country": data.get("country", "TR"),
+        "lang": data.get("lang", "tr"),
+        "test_type": data.get("testType", "mixed"),
+        "accuracy": accuracy,
+        "avg_reaction_ms": avg_reaction_ms,
+        "trials": trials,
+        "trial_types": types,
+        "score": compute_score(accuracy, avg_reaction_ms),
+        "brain_type": infer_brain_type(trials),
+    }
 
-    user_id = ensure_user(username, country=country, lang=lang)
-    score = compute_score(accuracy, avg_reaction_ms)
-    brain_type = infer_brain_type(details if isinstance(details, list) else [])
-    percentile = calculate_percentile(score)
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO scores (
-            user_id, test_type, accuracy, avg_reaction_ms, score, percentile,
-            brain_type, details_json, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            user_id,
-            test_type,
-            accuracy,
-            avg_reaction_ms,
-            score,
-            percentile,
-            brain_type,
-            json.dumps(details),
-            now_iso(),
-        ),
+def _score_row(user_id: int, result: dict, percentile: float, created_at: str) -> tuple:
+    return (
+        user_id,
+        result["test_type"],
+        result["accuracy"],
+        result["avg_reaction_ms"],
+        result["score"],
+        percentile,
+        result["brain_type"],
+        result["trials"].tobytes(),
+        result["trial_types"].tobytes(),
+        created_at,
     )
+
+
+@app.post("/api/submit_score")
+def submit_score():
+    try:
+        result = _parse_result(request.get_json(silent=True) or {})
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "Invalid result"}), 400
+    username = result["username"]
+    user_id = ensure_user(username, country=result["country"], lang=result["lang"])
+    percentile = calculate_percentile(result["score"])
+
+    conn = get_conn()
+    conn.execute(SCORE_INSERT_SQL, _score_row(user_id, result, percentile, now_iso()))
     conn.commit()
-    conn.close()
+    PERCENTILES.sync(force=True)
 
-    track_event("submit_score", {"username": username, "score": score, "testType": test_type})
+    track_event("submit_score", {"username": username, "score": result["score"], "testType": result["test_type"]})
 
     payload = {
         "ok": True,
-        "score": score,
+        "score": result["score"],
         "percentile": percentile,
-        "brainType": brain_type,
+        "brainType": result["brain_type"],
     }
-    socketio.emit("leaderboard_updated", get_leaderboard_payload())
+    LEADERBOARD.mark_dirty()
     return jsonify(payload)
 
 
+@app.post("/api/submit_scores")
+def submit_scores():
+    """Çevrimdışı biriken sonuçları tek istekte kaydeder.
+
+    Gövde `{"username", "country", "lang", "results": [...]}` ya da doğrudan
+    sonuç listesidir; üst düzey alanlar her sonuç için varsayılandır.
+    Kullanıcılar tek sorguda çözülür, percentile'lar aynı anlık dağılıma göre
+    hesaplanır, tüm satırlar tek transaction'da yazılır ve tek leaderboard
+    güncellemesi tetiklenir.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        data = {"results": data}
+    data = data or {}
+    raw_results = data.get("results")
+    if not isinstance(raw_results, list) or not raw_results:
+        return jsonify({"ok": False, "error": "results must be a non-empty list"}), 400
+    if len(raw_results) > MAX_BATCH_RESULTS:
+        return jsonify({"ok": False, "error": f"At most {MAX_BATCH_RESULTS} results per batch"}), 400
+
+    defaults = {k: data[k] for k in ("username", "country", "lang") if k in data}
+    try:
+        results = [_parse_result(r, defaults) for r in raw_results if isinstance(r, dict)]
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "Invalid result"}), 400
+    if len(results) != len(raw_results):
+        return jsonify({"ok": False, "error": "Invalid result"}), 400
+
+    # Aynı ad birden çok kez geçerse ilk sonucun ülke / dili kullanılır.
+    profiles = {}
+    for r in results:
+        profiles.setdefault(r["username"], (r["country"], r["lang"]))
+    user_ids = resolve_users([r["username"] for r in results], profiles=profiles)
+    PERCENTILES.ensure_loaded()
+    percentiles = PERCENTILES.percentiles([r["score"] for r in results])
+
+    created_at = now_iso()
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            SCORE_INSERT_SQL,
+            [
+                _score_row(user_ids[r["username"]], r, pct, created_at)
+                for r, pct in zip(results, percentiles)
+            ],
+        )
+    PERCENTILES.sync(force=True)
+
+    track_event("submit_scores", {"count": len(results), "usernames": sorted(user_ids)})
+    LEADERBOARD.mark_dirty()
+    return jsonify(
+        {
+            "ok": True,
+            "results": [
+                {"score": r["score"], "percentile": pct, "brainType": r["brain_type"]}
+                for r, pct in zip(results, percentiles)
+            ],
+        }
+    )
+
+
 @app.get("/api/leaderboard")
 def leaderboard():
-    return jsonify(get_leaderboard_payload())
+    test_type = request.args.get("testType")
+    period = request.args.get("window")
+    if not test_type and not period:
+        return jsonify(LEADERBOARD.get())
+
+    if test_type and period:
+        return jsonify({"ok": False, "error": "Use either testType or window"}), 400
+    if period and period not in LEADERBOARD_PERIODS:
+        return jsonify({"ok": False, "error": "window must be daily or weekly"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 100))
+    except ValueError:
+        limit = 50
+    return jsonify(get_scoped_leaderboard(test_type=test_type, period=period, limit=limit))
+
+
+@app.get("/api/leaderboard/scores")
+def leaderboard_scores():
+    """Global leaderboard'un keyset sayfaları: `?after=<nextCursor>&limit=50`."""
+    try:
+        after = decode_cursor(request.args["after"]) if request.args.get("after") else None
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid cursor"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), LEADERBOARD_PAGE_MAX))
+    except ValueError:
+        limit = 50
+    return jsonify(get_leaderboard_page(after=after, limit=limit))
+
+
+@app.get("/api/rank")
+def rank():
+    username = (request.args.get("username") or "")[:32]
+    user_id = USER_IDS.get(username) or _select_user_ids(get_conn(), [username]).get(username)
+    result = rank_of(user_id) if user_id is not None else None
+    if result is None:
+        return jsonify({"ok": False, "error": "No scores for user"}), 404
+    return jsonify({"ok": True, "username": username, **result})
+
+
+def _parse_hour(value: str | None, end: bool = False) -> str | None:
+    """ISO zamanı UTC saat anahtarına (`YYYY-MM-DDTHH`) çevirir.
+
+    Saat dilimli değerler önce UTC'ye çevrilir. `end` ile yalnızca tarih
+    verilirse (`to=2024-05-02`) günün son saati kullanılır, gün dahil olur.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and _is_date_only(value):
+        parsed += timedelta(hours=23)
+    return parsed.isoformat(timespec="hours")[:13]
+
+
+def _is_date_only(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
 
 
 @app.get("/api/analytics")
 def analytics():
+    try:
+        since = _parse_hour(request.args.get("from"))
+        until = _parse_hour(request.args.get("to"), end=True)
+    except ValueError:
+        return jsonify({"ok": False, "error": "from/to must be ISO timestamps"}), 400
+    granularity = request.args.get("granularity", "total")
+    if granularity not in ("total", "hour"):
+        return jsonify({"ok": False, "error": "granularity must be total or hour"}), 400
+
+    where, params = [], []
+    if since:
+        where.append("hour >= ?")
+        params.append(since)
+    if until:
+        where.append("hour <= ?")
+        params.append(until)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT event_name, COUNT(*) as count FROM analytics GROUP BY event_name")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return jsonify({"events": rows})
+    if granularity == "hour":
+        rows = conn.execute(
+            f"SELECT hour, event_name, count FROM analytics_hourly {where_sql} ORDER BY hour, event_name",
+            params,
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT event_name, SUM(count) AS count FROM analytics_hourly {where_sql} GROUP BY event_name",
+            params,
+        ).fetchall()
+    return jsonify({"events": [dict(r) for r in rows], "from": since, "to": until})
+
+
+@app.get("/api/reaction_stats")
+def reaction_stats():
+    """Son `days` gündeki tüm denemelerin tip bazlı reaksiyon istatistikleri.
+
+    Paketli bloblar parça parça tek `np.frombuffer` ile okunur; JSON
+    ayrıştırılmaz ve denemeler bellekte biriktirilmez.
+    """
+    try:
+        days = max(1, min(int(request.args.get("days", 7)), REACTION_STATS_MAX_DAYS))
+    except ValueError:
+        return jsonify({"ok": False, "error": "days must be an integer"}), 400
+    test_type = request.args.get("testType")
+
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat(timespec="seconds")
+    sql = "SELECT details_blob, trial_types FROM scores WHERE created_at >= ? AND details_blob IS NOT NULL"
+    params = [since]
+    if test_type:
+        sql += " AND test_type = ?"
+        params.append(test_type)
+
+    overall = RunningStats()
+    by_type = {}
+    cur = get_conn().execute(sql, params)
+    while True:
+        rows = cur.fetchmany(REACTION_STATS_CHUNK)
+        if not rows:
+            break
+        trials = np.frombuffer(b"".join(r[0] for r in rows), dtype=DETAIL_DTYPE).reshape(-1, 2)
+        types = np.frombuffer(b"".join(r[1] or b"" for r in rows), dtype=np.uint8)
+        overall.extend(trials[:, 0])
+        if len(types) != len(trials):
+            continue
+        for code in np.unique(types):
+            mask = types == code
+            reaction, accuracy = by_type.setdefault(int(code), (RunningStats(), RunningStats()))
+            reaction.extend(trials[mask, 0])
+            accuracy.extend(trials[mask, 1])
+
+    return jsonify(
+        {
+            "days": days,
+            "testType": test_type,
+            "reactionMs": overall.as_dict(),
+            "byTrialType": {
+                TRIAL_TYPES[code] if code < len(TRIAL_TYPES) else "unknown": {
+                    "reactionMs": reaction.as_dict(),
+                    "accuracy": round(accuracy.mean, 4),
+                }
+                for code, (reaction, accuracy) in sorted(by_type.items())
+            },
+        }
+    )
 
 
 @app.post("/api/create_room")
 def create_room():
     data = request.get_json(silent=True) or {}
-    room_code = _gen_room_code()
     username = data.get("username", "guest")[:32]
     user_id = ensure_user(username, country=data.get("country", "TR"), lang=data.get("lang", "tr"))
 
-    ROOMS[room_code] = {
-        "host": username,
-        "players": {username: {"user_id": user_id, "ready": False, "score": 0}},
-        "created": time.time(),
-        "status": "waiting",
-    }
+    room_code = _create_room(
+        {
+            "host": username,
+            "players": {username: {"user_id": user_id, "ready": False, "score": 0}},
+            "created": time.time(),
+            "status": "waiting",
+        }
+    )
     track_event("room_created", {"room": room_code, "host": username})
     return jsonify({"ok": True, "roomCode": room_code})
 
@@ -315,19 +1497,30 @@ def join_room_http():
     room_code = (data.get("roomCode") or "").upper()
     username = data.get("username", "guest")[:32]
 
-    if room_code not in ROOMS:
+    room = ROOM_STORE.get(room_code)
+    if room is None:
         return jsonify({"ok": False, "error": "Room not found"}), 404
-
-    room = ROOMS[room_code]
     if len(room["players"]) >= 4 and username not in room["players"]:
         return jsonify({"ok": False, "error": "Room full"}), 400
 
     user_id = ensure_user(username, country=data.get("country", "TR"), lang=data.get("lang", "tr"))
-    room["players"][username] = {"user_id": user_id, "ready": False, "score": 0}
+    with ROOM_STORE.update(room_code) as room:
+        if room is None:
+            return jsonify({"ok": False, "error": "Room not found"}), 404
+        if len(room["players"]) >= 4 and username not in room["players"]:
+            return jsonify({"ok": False, "error": "Room full"}), 400
+        room["players"][username] = {"user_id": user_id, "ready": False, "score": 0}
+        touch_room(room_code, room)
+        snapshot = room_snapshot(room_code, room)
 
     track_event("room_joined", {"room": room_code, "user": username})
-    socketio.emit("room_state", room_snapshot(room_code), to=room_code)
-    return jsonify({"ok": True, "room": room_snapshot(room_code)})
+    socketio.emit("room_state", snapshot, to=room_code)
+    return jsonify({"ok": True, "room": snapshot})
+
+
+@app.get("/api/metrics")
+def metrics():
+    return jsonify({"progress": PROGRESS.stats(), "rooms": ROOM_EXPIRY.gauges(), "analytics": ANALYTICS.stats()})
 
 
 @app.get("/api/countries")
@@ -350,9 +1543,8 @@ def on_disconnect():
         return
     room_code = user.get("room")
     username = user.get("username")
-    if room_code in ROOMS and username in ROOMS[room_code]["players"]:
-        ROOMS[room_code]["players"].pop(username, None)
-        emit("room_state", room_snapshot(room_code), to=room_code)
+    if room_code:
+        _remove_player(room_code, username)
 
 
 @socketio.on("presence")
@@ -368,7 +1560,8 @@ def on_join_room(data):
     room_code = (data.get("roomCode") or "").upper()
     username = data.get("username", "guest")[:32]
 
-    if room_code not in ROOMS:
+    room = ROOM_STORE.get(room_code)
+    if room is None:
         emit("error_msg", {"error": "Room not found"})
         return
 
@@ -376,11 +1569,20 @@ def on_join_room(data):
     ONLINE_USERS.setdefault(request.sid, {})["username"] = username
     ONLINE_USERS[request.sid]["room"] = room_code
 
-    if username not in ROOMS[room_code]["players"]:
-        user_id = ensure_user(username)
-        ROOMS[room_code]["players"][username] = {"user_id": user_id, "ready": False, "score": 0}
+    user_id = None if username in room["players"] else ensure_user(username)
+    with ROOM_STORE.update(room_code) as room:
+        if room is None:
+            return
+        if username not in room["players"]:
+            room["players"][username] = {
+                "user_id": user_id or ensure_user(username),
+                "ready": False,
+                "score": 0,
+            }
+        touch_room(room_code, room)
+        snapshot = room_snapshot(room_code, room)
 
-    emit("room_state", room_snapshot(room_code), to=room_code)
+    emit("room_state", snapshot, to=room_code)
 
 
 @socketio.on("leave_room")
@@ -390,9 +1592,7 @@ def on_leave_room(data):
     username = data.get("username", "guest")[:32]
 
     leave_room(room_code)
-    if room_code in ROOMS:
-        ROOMS[room_code]["players"].pop(username, None)
-        emit("room_state", room_snapshot(room_code), to=room_code)
+    _remove_player(room_code, username)
 
 
 @socketio.on("player_ready")
@@ -401,18 +1601,35 @@ def on_player_ready(data):
     room_code = (data.get("roomCode") or "").upper()
     username = data.get("username", "guest")[:32]
 
-    room = ROOMS.get(room_code)
-    if not room:
-        emit("error_msg", {"error": "Room not found"})
-        return
-
-    if username in room["players"]:
-        room["players"][username]["ready"] = True
-
-    ready_count = sum(1 for p in room["players"].values() if p.get("ready"))
-    emit("room_state", room_snapshot(room_code), to=room_code)
-
-    if ready_count >= 2:
+    with ROOM_STORE.update(room_code) as room:
+        if not room:
+            emit("error_msg", {"error": "Room not found"})
+            return
+
+        if room.get("status") == "finished":
+            # Rövanş: oda lobiye döner; herkes yeniden hazır olmalı, önceki
+            # maçın skorları ve bitiş bayrakları sıfırlanır.
+            room["status"] = "waiting"
+            for player in room["players"].values():
+                player["ready"] = False
+                player["score"] = 0
+                player.pop("finished", None)
+                player.pop("avgReactionMs", None)
+        if username in room["players"]:
+            room["players"][username]["ready"] = True
+        touch_room(room_code, room)
+
+        ready_count = sum(1 for p in room["players"].values() if p.get("ready"))
+        # Durum kilit altında değiştirilir; aynı maç iki süreçte başlamaz.
+        should_start = ready_count >= 2 and room.get("status") != "running"
+        if should_start:
+            room["status"] = "running"
+        snapshot = room_snapshot(room_code, room)
+
+    emit("room_state", snapshot, to=room_code)
+
+    if should_start:
+        PROGRESS.reset(room_code)
         start_match(room_code)
 
 
@@ -423,24 +1640,8 @@ def on_match_progress(data):
     username = data.get("username", "guest")[:32]
     score = float(data.get("score", 0))
 
-    room = ROOMS.get(room_code)
-    if not room:
-        return
-
-    if username in room["players"]:
-        room["players"][username]["score"] = score
-
-    emit(
-        "live_progress",
-        {
-            "roomCode": room_code,
-            "players": [
-                {"username": u, "score": p.get("score", 0)}
-                for u, p in room["players"].items()
-            ],
-        },
-        to=room_code,
-    )
+    # Odaya yazım ve üyelik kontrolü toplayıcının tikinde yapılır.
+    PROGRESS.record(room_code, username, score)
 
 
 @socketio.on("finish_match")
@@ -451,36 +1652,56 @@ def on_finish_match(data):
     final_score = float(data.get("finalScore", 0))
     reaction_ms = float(data.get("avgReactionMs", 900))
 
-    room = ROOMS.get(room_code)
-    if not room:
-        emit("error_msg", {"error": "Room not found"})
-        return
+    with ROOM_STORE.update(room_code) as room:
+        if not room:
+            emit("error_msg", {"error": "Room not found"})
+            return
 
-    room["players"].setdefault(username, {"score": 0, "ready": True})
-    room["players"][username]["score"] = final_score
-    room["players"][username]["avgReactionMs"] = reaction_ms
-    room["players"][username]["finished"] = True
+        player = room["players"].setdefault(username, {"score": 0, "ready": True})
+        player["score"] = final_score
+        player["avgReactionMs"] = reaction_ms
+        player["finished"] = True
 
-    all_finished = all(p.get("finished") for p in room["players"].values() if p.get("ready"))
-    emit("room_state", room_snapshot(room_code), to=room_code)
+        all_finished = all(p.get("finished") for p in room["players"].values() if p.get("ready"))
+        should_finalize = all_finished and room.get("status") == "running"
+        if should_finalize:
+            room["status"] = "finished"
+        touch_room(room_code, room)
+        snapshot = room_snapshot(room_code, room)
 
-    if all_finished:
+    emit("room_state", snapshot, to=room_code)
+
+    if should_finalize:
         finalize_match(room_code)
 
 
 # ------------------------------------------------------------
 # Multiplayer yardımcıları
 # ------------------------------------------------------------
-def _gen_room_code() -> str:
+def _create_room(room: dict) -> str:
+    """Odayı çakışmayan yeni bir kodla depoya atomik olarak ekler."""
     alphabet = string.ascii_uppercase + string.digits
+    room["touched"] = time.time()
     while True:
         code = "".join(random.choice(alphabet) for _ in range(6))
-        if code not in ROOMS:
+        if ROOM_STORE.create(code, room):
+            ROOM_EXPIRY.schedule(code, room)
             return code
 
 
-def room_snapshot(room_code: str) -> dict:
-    room = ROOMS.get(room_code, {"players": {}})
+def _remove_player(room_code: str, username: str) -> None:
+    with ROOM_STORE.update(room_code) as room:
+        if room is None or username not in room["players"]:
+            return
+        room["players"].pop(username, None)
+        touch_room(room_code, room)
+        snapshot = room_snapshot(room_code, room)
+    socketio.emit("room_state", snapshot, to=room_code)
+
+
+def room_snapshot(room_code: str, room: dict | None = None) -> dict:
+    if room is None:
+        room = ROOM_STORE.get(room_code) or {"players": {}}
     return {
         "roomCode": room_code,
         "status": room.get("status", "waiting"),
@@ -497,13 +1718,21 @@ def room_snapshot(room_code: str) -> dict:
     }
 
 
+def _room_user_ids(room: dict) -> dict:
+    """Odadaki oyuncuların id'leri; eksik olanlar tek toplu sorguyla çözülür."""
+    user_ids = {u: p["user_id"] for u, p in room["players"].items() if p.get("user_id")}
+    missing = [u for u in room["players"] if u not in user_ids]
+    if missing:
+        user_ids.update(resolve_users(missing))
+    return user_ids
+
+
 def start_match(room_code: str):
-    room = ROOMS.get(room_code)
+    # Oda durumu çağıran tarafından kilit altında "running" yapılmıştır.
+    room = ROOM_STORE.get(room_code)
     if not room:
         return
 
-    room["status"] = "running"
-
     conn = get_conn()
     cur = conn.cursor()
     cur.execute(
@@ -512,24 +1741,24 @@ def start_match(room_code: str):
     )
     match_id = cur.lastrowid
 
-    for username, pdata in room["players"].items():
-        cur.execute(
-            "INSERT INTO match_players (match_id, user_id, total_score, avg_reaction_ms) VALUES (?, ?, ?, ?)",
-            (match_id, pdata.get("user_id", ensure_user(username)), 0, 0),
-        )
+    user_ids = _room_user_ids(room)
+    cur.executemany(
+        "INSERT INTO match_players (match_id, user_id, total_score, avg_reaction_ms) VALUES (?, ?, ?, ?)",
+        [(match_id, user_ids[username], 0, 0) for username in room["players"]],
+    )
 
     conn.commit()
-    conn.close()
 
-    ACTIVE_MATCHES[room_code] = {"match_id": match_id, "started_at": time.time()}
+    ROOM_STORE.set_match(room_code, {"match_id": match_id, "started_at": time.time()})
     track_event("match_started", {"room": room_code, "matchId": match_id})
 
     emit("match_started", {"roomCode": room_code, "matchId": match_id}, to=room_code)
 
 
 def finalize_match(room_code: str):
-    room = ROOMS.get(room_code)
-    active = ACTIVE_MATCHES.get(room_code)
+    # Oda durumu çağıran tarafından kilit altında "finished" yapılmıştır.
+    room = ROOM_STORE.get(room_code)
+    active = ROOM_STORE.pop_match(room_code)
     if not room or not active:
         return
 
@@ -546,17 +1775,17 @@ def finalize_match(room_code: str):
         (winner_user_id, "finished", now_iso(), active["match_id"]),
     )
 
-    for username, pdata in room["players"].items():
-        uid = pdata.get("user_id", ensure_user(username))
-        cur.execute(
-            "UPDATE match_players SET total_score = ?, avg_reaction_ms = ? WHERE match_id = ? AND user_id = ?",
-            (pdata.get("score", 0), pdata.get("avgReactionMs", 0), active["match_id"], uid),
-        )
+    user_ids = _room_user_ids(room)
+    cur.executemany(
+        "UPDATE match_players SET total_score = ?, avg_reaction_ms = ? WHERE match_id = ? AND user_id = ?",
+        [
+            (pdata.get("score", 0), pdata.get("avgReactionMs", 0), active["match_id"], user_ids[username])
+            for username, pdata in room["players"].items()
+        ],
+    )
 
     conn.commit()
-    conn.close()
 
-    room["status"] = "finished"
     track_event("match_finished", {"room": room_code, "winner": winner_username})
 
     emit(
@@ -572,35 +1801,478 @@ def finalize_match(room_code: str):
     )
 
 
-def get_leaderboard_payload() -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
+LEADERBOARD_PAGE_MAX = 100
+
+
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['score']!r}:{row['avg_reaction_ms']!r}:{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """`encode_cursor` çıktısını (score, avg_reaction_ms, id) olarak çözer; bozuksa ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, avg_ms, score_id = raw.split(":")
+        return float(score), float(avg_ms), int(score_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def get_leaderboard_page(after: tuple | None = None, limit: int = 50) -> dict:
+    """(score DESC, avg_reaction_ms ASC, id) sırasında `after`'dan sonraki satırlar.
+
+    OFFSET yerine son satırın anahtarından devam edildiği için her sayfa,
+    derinliğinden bağımsız olarak kapsayan index üzerinde O(log n + limit)
+    maliyetlidir.
+    """
+    where, params = "", []
+    if after:
+        score, avg_ms, score_id = after
+        where = """
+        WHERE s.score <= ?
+          AND (s.score < ? OR s.avg_reaction_ms > ? OR (s.avg_reaction_ms = ? AND s.id > ?))
         """
-        SELECT s.score, s.avg_reaction_ms, s.brain_type, s.percentile, s.created_at,
+        params = [score, score, avg_ms, avg_ms, score_id]
+    rows = get_conn().execute(
+        f"""
+        SELECT s.id, s.score, s.avg_reaction_ms, s.brain_type, s.percentile, s.created_at,
                u.username, u.country
         FROM scores s
         JOIN users u ON u.id = s.user_id
-        ORDER BY s.score DESC, s.avg_reaction_ms ASC
-        LIMIT 50
-        """
-    )
-    rows = [dict(r) for r in cur.fetchall()]
+        {where}
+        ORDER BY s.score DESC, s.avg_reaction_ms ASC, s.id ASC
+        LIMIT ?
+        """,
+        (*params, limit),
+    ).fetchall()
+    rows = [dict(r) for r in rows]
+    next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+    return {"rows": rows, "nextCursor": next_cursor}
 
-    cur.execute(
+
+def rank_of(user_id: int) -> dict | None:
+    """Kullanıcının en iyi skorunun global sıralamadaki yeri.
+
+    Daha yüksek skorlar Fenwick ağacından O(log n) sayılır; yalnızca aynı
+    skordaki eşitlikler index üzerinde aralık taramasıyla çözülür.
+    """
+    best = get_conn().execute(
         """
-        SELECT u.country, MAX(s.score) as top_score
-        FROM scores s
-        JOIN users u ON u.id = s.user_id
-        GROUP BY u.country
-        ORDER BY top_score DESC
-        LIMIT 10
+        SELECT id, score, avg_reaction_ms FROM scores
+        WHERE user_id = ?
+        ORDER BY score DESC, avg_reaction_ms ASC
+        LIMIT 1
+        """,
+        (user_id,),
+    ).fetchone()
+    if best is None:
+        return None
+
+    PERCENTILES.ensure_loaded()
+    if SCORE_MIN < best["score"] < SCORE_MAX:
+        higher = PERCENTILES.count_gt(best["score"])
+    else:
+        # Uç kovalar aralık dışı (eski) skorları da içerir; kesin sayım index'ten.
+        higher = get_conn().execute("SELECT COUNT(*) FROM scores WHERE score > ?", (best["score"],)).fetchone()[0]
+    ties_ahead = get_conn().execute(
         """
-    )
-    country_rows = [dict(r) for r in cur.fetchall()]
+        SELECT COUNT(*) FROM scores
+        WHERE score = ? AND (avg_reaction_ms < ? OR (avg_reaction_ms = ? AND id < ?))
+        """,
+        (best["score"], best["avg_reaction_ms"], best["avg_reaction_ms"], best["id"]),
+    ).fetchone()[0]
+    return {
+        "rank": higher + ties_ahead + 1,
+        "total": PERCENTILES.total(),
+        "scoreId": best["id"],
+        "score": best["score"],
+        "avgReactionMs": best["avg_reaction_ms"],
+        "cursor": encode_cursor(dict(best)),
+    }
+
+
+def get_leaderboard_payload() -> dict:
+    page = get_leaderboard_page(limit=50)
+    conn = get_conn()
+    country_rows = [
+        dict(r)
+        for r in conn.execute("SELECT country, top_score FROM country_best ORDER BY top_score DESC LIMIT 10")
+    ]
+    return {
+        "global": page["rows"],
+        "countries": country_rows,
+        "nextCursor": page["nextCursor"],
+        "updatedAt": now_iso(),
+    }
+
+
+LEADERBOARD_PERIODS = ("daily", "weekly")
+
+
+def period_start(period: str, when: datetime | None = None) -> str:
+    """Günlük/haftalık pencerenin başlangıç tarihi (UTC, hafta Pazartesi başlar)."""
+    day = (when or datetime.utcnow()).date()
+    if period == "weekly":
+        day -= timedelta(days=day.weekday())
+    return day.isoformat()
 
-    conn.close()
-    return {"global": rows, "countries": country_rows, "updatedAt": now_iso()}
+
+def get_scoped_leaderboard(test_type: str | None = None, period: str | None = None, limit: int = 50) -> dict:
+    """Test tipine veya güncel güne/haftaya göre kullanıcı başı en iyi skorlar."""
+    conn = get_conn()
+    if period:
+        start = period_start(period)
+        rows = conn.execute(
+            """
+            SELECT b.score_id AS id, b.score, b.avg_reaction_ms, b.created_at, u.username, u.country
+            FROM period_best b
+            JOIN users u ON u.id = b.user_id
+            WHERE b.period = ? AND b.period_start = ?
+            ORDER BY b.score DESC, b.avg_reaction_ms ASC
+            LIMIT ?
+            """,
+            (period, start, limit),
+        ).fetchall()
+        scope = {"window": period, "windowStart": start}
+    else:
+        rows = conn.execute(
+            """
+            SELECT b.score_id AS id, b.score, b.avg_reaction_ms, b.created_at, u.username, u.country
+            FROM test_type_best b
+            JOIN users u ON u.id = b.user_id
+            WHERE b.test_type = ?
+            ORDER BY b.score DESC, b.avg_reaction_ms ASC
+            LIMIT ?
+            """,
+            (test_type, limit),
+        ).fetchall()
+        scope = {"testType": test_type}
+    return {**scope, "rows": [dict(r) for r in rows], "updatedAt": now_iso()}
+
+
+# ------------------------------------------------------------
+# Arka plan tikleri
+# ------------------------------------------------------------
+def start_ticker(name: str, interval: float, fn) -> None:
+    """`fn`'i app context içinde her `interval` saniyede bir çalıştırır."""
+
+    def loop():
+        while True:
+            socketio.sleep(interval)
+            try:
+                with app.app_context():
+                    fn()
+            except Exception as exc:  # tik döngüsü ölmesin
+                print(f"{name} tick hatası: {exc}")
+
+    socketio.start_background_task(loop)
+
+
+# ------------------------------------------------------------
+# Canlı ilerleme toplayıcısı
+# ------------------------------------------------------------
+PROGRESS_TICK_HZ = float(os.environ.get("PROGRESS_TICK_HZ", "10"))
+
+
+class ProgressAggregator:
+    """`match_progress` event'lerini oda başına toplayıp sabit tikte yayınlar.
+
+    Her oyuncunun yalnızca son skoru tutulur; tikte sadece önceki yayından
+    beri skoru değişen oyuncular `live_progress` ile gönderilir; oda
+    deposuna da tik başına tek yazım yapılır. `stats` oda başına gelen
+    event ve giden yayın sayılarını tutar.
+    """
+
+    def __init__(self, hz: float = PROGRESS_TICK_HZ):
+        self.interval = 1.0 / hz
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._sent = {}
+        self._stats = {}
+        self._started = False
+
+    def record(self, room_code: str, username: str, score: float) -> None:
+        with self._lock:
+            self._pending.setdefault(room_code, {})[username] = score
+            stats = self._stats.setdefault(room_code, {"received": 0, "emitted": 0})
+            stats["received"] += 1
+            if not self._started:
+                self._started = True
+                start_ticker("progress", self.interval, self.tick)
+
+    def tick(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            batches = []
+            for room_code, scores in pending.items():
+                last = self._sent.setdefault(room_code, {})
+                changed = [
+                    {"username": u, "score": score}
+                    for u, score in scores.items()
+                    if last.get(u) != score
+                ]
+                if not changed:
+                    continue
+                last.update(scores)
+                self._stats[room_code]["emitted"] += 1
+                batches.append((room_code, changed))
+        for room_code, changed in batches:
+            with ROOM_STORE.update(room_code) as room:
+                if room is None:
+                    self.forget(room_code)
+                    continue
+                players = room["players"]
+                # Odada olmayanlar ve skoru finish_match ile kesinleşenler atlanır.
+                changed = [
+                    c for c in changed
+                    if c["username"] in players and not players[c["username"]].get("finished")
+                ]
+                for c in changed:
+                    players[c["username"]]["score"] = c["score"]
+                if changed:
+                    touch_room(room_code, room)
+            if changed:
+                socketio.emit("live_progress", {"roomCode": room_code, "players": changed}, to=room_code)
+
+    def reset(self, room_code: str) -> None:
+        """Yeni maç başında önceki maçın bekleyen / yayınlanmış skorlarını unutur."""
+        with self._lock:
+            self._pending.pop(room_code, None)
+            self._sent.pop(room_code, None)
+
+    def forget(self, room_code: str) -> None:
+        with self._lock:
+            self._pending.pop(room_code, None)
+            self._sent.pop(room_code, None)
+            self._stats.pop(room_code, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                room_code: {
+                    **counts,
+                    "saved": counts["received"] - counts["emitted"],
+                }
+                for room_code, counts in self._stats.items()
+            }
+
+
+PROGRESS = ProgressAggregator()
+
+
+# ------------------------------------------------------------
+# Oda ömrü (expiry)
+# ------------------------------------------------------------
+ROOM_TTL_FINISHED = float(os.environ.get("ROOM_TTL_FINISHED", "300"))
+ROOM_TTL_EMPTY = float(os.environ.get("ROOM_TTL_EMPTY", "60"))
+ROOM_TTL_IDLE = float(os.environ.get("ROOM_TTL_IDLE", "1800"))
+ROOM_SWEEP_INTERVAL = float(os.environ.get("ROOM_SWEEP_INTERVAL", "5"))
+
+
+def touch_room(room_code: str, room: dict) -> None:
+    """Oda aktivitesini işaretler; `ROOM_STORE.update` bloğu içinde çağrılır."""
+    room["touched"] = time.time()
+    ROOM_EXPIRY.schedule(room_code, room)
+
+
+class RoomExpiry:
+    """Oda son kullanma zamanlarını bir min-heap'te tutar.
+
+    Bitmiş odalar `ROOM_TTL_FINISHED`, boş odalar `ROOM_TTL_EMPTY`, aktivitesi
+    kesilen odalar `ROOM_TTL_IDLE` saniye sonra silinir; bağlı maç kaydı ve
+    toplayıcı durumu da geri alınır. Heap girdileri tembel doğrulanır: süresi
+    dolan girdi odanın güncel durumuna göre yeniden hesaplanır, oda hâlâ
+    canlıysa yeni zamanla tekrar eklenir. Heap süreç başınadır; paylaşımlı
+    depoda odayı hangi süreç silerse geri alımı o yapar.
+    """
+
+    def __init__(self, sweep_interval: float = ROOM_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self._heap = []
+        self._scheduled = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    @staticmethod
+    def deadline(room: dict) -> float:
+        touched = room.get("touched", room.get("created", time.time()))
+        if room.get("status") == "finished":
+            return touched + ROOM_TTL_FINISHED
+        if not room.get("players"):
+            return touched + ROOM_TTL_EMPTY
+        return touched + ROOM_TTL_IDLE
+
+    def schedule(self, room_code: str, room: dict) -> None:
+        self._push(room_code, self.deadline(room))
+
+    def _push(self, room_code: str, deadline: float) -> None:
+        with self._lock:
+            # Daha geç bir girdi zaten varsa o girdi pop edildiğinde yeniden
+            # hesaplanır; yalnızca süre kısaldığında yeni girdi gerekir.
+            if deadline < self._scheduled.get(room_code, float("inf")):
+                self._scheduled[room_code] = deadline
+                heapq.heappush(self._heap, (deadline, room_code))
+            if not self._started:
+                self._started = True
+                start_ticker("room-expiry", self.sweep_interval, self.sweep)
+
+    def sweep(self, now: float | None = None) -> list:
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, room_code = heapq.heappop(self._heap)
+                if self._scheduled.get(room_code) == deadline:
+                    del self._scheduled[room_code]
+                due.append(room_code)
+
+        expired = []
+        for room_code in due:
+            with ROOM_STORE.update(room_code) as room:
+                if room is None:
+                    continue
+                deadline = self.deadline(room)
+                if deadline > now:
+                    self._push(room_code, deadline)
+                    continue
+                if ROOM_STORE.delete(room_code) is not None:
+                    expired.append((room_code, room))
+        for room_code, room in expired:
+            self._reclaim(room_code, room)
+        return [room_code for room_code, _ in expired]
+
+    def _reclaim(self, room_code: str, room: dict) -> None:
+        with self._lock:
+            self._scheduled.pop(room_code, None)
+        active = ROOM_STORE.pop_match(room_code)
+        if active and room.get("status") != "finished":
+            conn = get_conn()
+            conn.execute(
+                "UPDATE matches SET status = ?, ended_at = ? WHERE id = ?",
+                ("abandoned", now_iso(), active["match_id"]),
+            )
+            conn.commit()
+        PROGRESS.forget(room_code)
+        for user in ONLINE_USERS.values():
+            if user.get("room") == room_code:
+                user["room"] = None
+        socketio.emit("room_expired", {"roomCode": room_code}, to=room_code)
+        socketio.close_room(room_code)
+        self.evicted += 1
+        track_event("room_expired", {"room": room_code, "status": room.get("status")})
+
+    def gauges(self) -> dict:
+        with self._lock:
+            scheduled = len(self._heap)
+        gauges = {
+            **ROOM_STORE.stats(),
+            "onlineUsers": len(ONLINE_USERS),
+            "scheduled": scheduled,
+            "evicted": self.evicted,
+        }
+        if resource is not None:
+            gauges["maxRssKb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return gauges
+
+
+ROOM_EXPIRY = RoomExpiry()
+
+
+# ------------------------------------------------------------
+# Leaderboard servisi
+# ------------------------------------------------------------
+LEADERBOARD_INTERVAL = float(os.environ.get("LEADERBOARD_INTERVAL", "1.0"))
+
+
+def leaderboard_diff(previous: dict | None, current: dict) -> dict:
+    """İki leaderboard payload'u arasındaki farkı üretir.
+
+    Skor satırları değişmez olduğundan satırlar `id` ile eşlenir; istemci
+    `order` listesiyle eski satırları yeniden dizer, yalnızca `added`
+    satırları yeni gelir. `baseVersion` uyuşmazsa istemci tam payload'u
+    `/api/leaderboard` üzerinden çekmelidir.
+    """
+    prev_rows = previous.get("global", []) if previous else []
+    known_ids = {row["id"] for row in prev_rows}
+    diff = {
+        "version": current["version"],
+        "baseVersion": previous["version"] if previous else 0,
+        "order": [row["id"] for row in current["global"]],
+        "added": [row for row in current["global"] if row["id"] not in known_ids],
+        "updatedAt": current["updatedAt"],
+    }
+    if not previous or previous.get("countries") != current["countries"]:
+        diff["countries"] = current["countries"]
+    return diff
+
+
+def latest_score_id() -> int:
+    return get_conn().execute("SELECT COALESCE(MAX(id), 0) FROM scores").fetchone()[0]
+
+
+class LeaderboardService:
+    """Leaderboard payload'unu önbellekler ve yayınları birleştirir.
+
+    Sürüm `MAX(scores.id)`'dir; tüm worker'lar aynı DB durumu için aynı
+    sürümü üretir. Payload en fazla `interval` saniyede bir, sürüm
+    değiştiyse yeniden hesaplanır. `leaderboard_diff` yayınını yalnızca
+    `leaderboard` lease'ini tutan worker yapar; böylece mesaj kuyruğu
+    üzerinden istemcilere tik başına tek diff gider.
+    """
+
+    def __init__(self, interval: float = LEADERBOARD_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._payload = None
+        self._broadcasted = None
+        self._checked_at = 0.0
+        self._started = False
+
+    def mark_dirty(self) -> None:
+        """Skor yazımlarından sonra çağrılır; yayın tikini başlatır."""
+        self._ensure_started()
+
+    def get(self) -> dict:
+        with self._lock:
+            self._refresh_if_due()
+            return self._payload
+
+    def _refresh_if_due(self) -> None:
+        if self._payload is not None and time.monotonic() - self._checked_at < self.interval:
+            return
+        # Sürüm payload'dan önce okunur; arada gelen skor bir sonraki tikte yakalanır.
+        version = latest_score_id()
+        if self._payload is None or self._payload["version"] != version:
+            payload = get_leaderboard_payload()
+            payload["version"] = version
+            self._payload = payload
+        self._checked_at = time.monotonic()
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        start_ticker("leaderboard", self.interval, self.tick)
+
+    def tick(self) -> None:
+        if not ROOM_STORE.acquire_lease("leaderboard", WORKER_ID, self.interval * 3):
+            return
+        with self._lock:
+            self._refresh_if_due()
+            current = self._payload
+            previous = self._broadcasted
+            if previous is not None and previous["version"] == current["version"]:
+                return
+            self._broadcasted = current
+        socketio.emit("leaderboard_diff", leaderboard_diff(previous, current))
+
+
+LEADERBOARD = LeaderboardService()
 
 
 # ------------------------------------------------------------
@@ -621,6 +2293,8 @@ def server_error(e):
 # Entrypoint
 # ------------------------------------------------------------
 if __name__ == "__main__":
-    init_db()
+    with app.app_context():
+        init_db()
+        PERCENTILES.ensure_loaded()
     print("🧠 Düşünce Hızı Testi çalışıyor: http://localhost:5000")
     socketio.run(app, host="0.0.0.0", port=5000, debug=False)
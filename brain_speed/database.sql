@@ -15,7 +15,9 @@ CREATE TABLE IF NOT EXISTS scores (
     score REAL NOT NULL,
     percentile REAL DEFAULT 0,
     brain_type TEXT,
-    details_json TEXT,
+    details_json TEXT,  -- eski kayıtlar; yeni skorlar details_blob/trial_types kullanır
+    details_blob BLOB,  -- (n, 2) little-endian float32: [reactionMs, accuracy]
+    trial_types BLOB,   -- n adet uint8 deneme tipi kodu
     created_at TEXT NOT NULL,
     FOREIGN KEY(user_id) REFERENCES users(id)
 );
@@ -45,3 +47,79 @@ CREATE TABLE IF NOT EXISTS analytics (
     payload_json TEXT,
     created_at TEXT NOT NULL
 );
+
+-- Materyalize leaderboard'lar (scores insert trigger'ı ile güncellenir)
+CREATE INDEX IF NOT EXISTS idx_scores_created_at ON scores(created_at);
+-- Keyset sayfalama için kapsayan index ve kullanıcı başı en iyi skor index'i
+CREATE INDEX IF NOT EXISTS idx_scores_keyset ON scores(
+    score DESC, avg_reaction_ms ASC, id, user_id, brain_type, percentile, created_at
+);
+CREATE INDEX IF NOT EXISTS idx_scores_user_best ON scores(user_id, score DESC, avg_reaction_ms ASC);
+
+CREATE TABLE IF NOT EXISTS country_best (
+    country TEXT PRIMARY KEY,
+    top_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_country_best_score ON country_best(top_score DESC);
+
+CREATE TABLE IF NOT EXISTS test_type_best (
+    test_type TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    score_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    avg_reaction_ms REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (test_type, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_test_type_best_rank
+    ON test_type_best(test_type, score DESC, avg_reaction_ms ASC);
+
+-- period: 'daily' | 'weekly'; period_start: günün / haftanın (Pazartesi) tarihi
+CREATE TABLE IF NOT EXISTS period_best (
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    score_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    avg_reaction_ms REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (period, period_start, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_period_best_rank
+    ON period_best(period, period_start, score DESC, avg_reaction_ms ASC);
+
+CREATE TRIGGER IF NOT EXISTS trg_scores_leaderboards AFTER INSERT ON scores
+BEGIN
+    INSERT INTO country_best (country, top_score)
+    SELECT country, NEW.score FROM users WHERE id = NEW.user_id AND country IS NOT NULL
+    ON CONFLICT(country) DO UPDATE SET top_score = MAX(top_score, excluded.top_score);
+
+    INSERT INTO test_type_best (test_type, user_id, score_id, score, avg_reaction_ms, created_at)
+    VALUES (NEW.test_type, NEW.user_id, NEW.id, NEW.score, NEW.avg_reaction_ms, NEW.created_at)
+    ON CONFLICT(test_type, user_id) DO UPDATE SET
+        score_id = excluded.score_id, score = excluded.score,
+        avg_reaction_ms = excluded.avg_reaction_ms, created_at = excluded.created_at
+    WHERE excluded.score > score
+       OR (excluded.score = score AND excluded.avg_reaction_ms < avg_reaction_ms);
+
+    INSERT INTO period_best (period, period_start, user_id, score_id, score, avg_reaction_ms, created_at)
+    VALUES
+        ('daily', date(NEW.created_at), NEW.user_id, NEW.id, NEW.score, NEW.avg_reaction_ms, NEW.created_at),
+        ('weekly', date(NEW.created_at, '-6 days', 'weekday 1'), NEW.user_id, NEW.id, NEW.score,
+         NEW.avg_reaction_ms, NEW.created_at)
+    ON CONFLICT(period, period_start, user_id) DO UPDATE SET
+        score_id = excluded.score_id, score = excluded.score,
+        avg_reaction_ms = excluded.avg_reaction_ms, created_at = excluded.created_at
+    WHERE excluded.score > score
+       OR (excluded.score = score AND excluded.avg_reaction_ms < avg_reaction_ms);
+END;
+
+-- Saatlik analytics rollup'ları (analytics yazıcısı aynı batch'te günceller)
+CREATE INDEX IF NOT EXISTS idx_analytics_created_at ON analytics(created_at);
+
+CREATE TABLE IF NOT EXISTS analytics_hourly (
+    event_name TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, event_name)
+) WITHOUT ROWID;
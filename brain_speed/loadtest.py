@@ -0,0 +1,362 @@
+"""
+Düşünce Hızı Testi - yük testi
+------------------------------
+Simüle edilmiş oyuncularla tam multiplayer akışını koşturur
+(create_room -> join -> player_ready -> match_progress -> finish_match)
+ve `/api/submit_score` trafiği üretir. p50/p95/p99 gecikme, event
+throughput'u ve bellek raporlanır; sonuç JSON olarak kaydedilip sonraki
+koşularla karşılaştırılabilir.
+
+Varsayılan mod süreç içidir: uygulama geçici bir veritabanıyla import edilir
+ve Flask / Socket.IO test istemcileri kullanılır (ağ gerekmez, tekrarlanabilir).
+`--url` verilirse çalışan bir sunucuya gerçek Socket.IO istemcileriyle bağlanılır
+(`pip install "python-socketio[client]"`).
+
+    python loadtest.py --rooms 200 --concurrency 16 --save baselines/local.json
+    python loadtest.py --rooms 200 --concurrency 16 --compare baselines/local.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ------------------------------------------------------------
+# İstemciler
+# ------------------------------------------------------------
+class LocalClient:
+    """Süreç içi uygulamaya Flask / Socket.IO test istemcileriyle bağlanır."""
+
+    def __init__(self, app_module):
+        self._http = app_module.app.test_client()
+        self._sio = app_module.socketio.test_client(app_module.app)
+        self._inbox = []
+
+    def post(self, path: str, payload: dict) -> dict:
+        return self._http.post(path, json=payload).get_json()
+
+    def emit(self, event: str, payload: dict) -> None:
+        self._sio.emit(event, payload)
+
+    def wait_for(self, event: str, timeout: float = 10.0) -> dict:
+        deadline = time.perf_counter() + timeout
+        while True:
+            self._inbox.extend(self._sio.get_received())
+            for i, msg in enumerate(self._inbox):
+                if msg["name"] == event:
+                    del self._inbox[: i + 1]
+                    return msg["args"][0] if msg["args"] else {}
+            if time.perf_counter() > deadline:
+                raise TimeoutError(event)
+            time.sleep(0.001)
+
+    def close(self) -> None:
+        self._sio.disconnect()
+
+
+class RemoteClient:
+    """Çalışan bir sunucuya gerçek Socket.IO + HTTP ile bağlanır."""
+
+    def __init__(self, url: str):
+        import socketio
+
+        self.url = url.rstrip("/")
+        self._inbox = queue.Queue()
+        self._pending = []
+        self._sio = socketio.Client()
+        self._sio.on("*", lambda event, data=None: self._inbox.put((event, data)))
+        self._sio.connect(self.url)
+
+    def post(self, path: str, payload: dict) -> dict:
+        req = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=10) as res:
+            return json.loads(res.read())
+
+    def emit(self, event: str, payload: dict) -> None:
+        self._sio.emit(event, payload)
+
+    def wait_for(self, event: str, timeout: float = 10.0) -> dict:
+        deadline = time.perf_counter() + timeout
+        for i, (name, data) in enumerate(self._pending):
+            if name == event:
+                del self._pending[: i + 1]
+                return data or {}
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(event)
+            try:
+                name, data = self._inbox.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(event) from None
+            if name == event:
+                self._pending.clear()
+                return data or {}
+            self._pending.append((name, data))
+
+    def close(self) -> None:
+        self._sio.disconnect()
+
+
+# ------------------------------------------------------------
+# Ölçüm
+# ------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.events = 0
+
+    def timed(self, name: str, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            self.events += 1
+        return result
+
+    def error(self, name: str) -> None:
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+def summarize(samples: list[float]) -> dict:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3) if values else 0.0,
+    }
+
+
+# ------------------------------------------------------------
+# Senaryolar
+# ------------------------------------------------------------
+def run_room(make_client, rec: Recorder, room_idx: int, players: int, progress_events: int) -> None:
+    names = [f"lt{room_idx}_{i}" for i in range(players)]
+    clients = [make_client() for _ in names]
+    try:
+        host = clients[0]
+        created = rec.timed("http.create_room", host.post, "/api/create_room", {"username": names[0]})
+        code = created["roomCode"]
+        for name, client in zip(names[1:], clients[1:]):
+            rec.timed("http.join_room", client.post, "/api/join_room", {"roomCode": code, "username": name})
+
+        for name, client in zip(names, clients):
+            def join(client=client, name=name):
+                client.emit("join_room", {"roomCode": code, "username": name})
+                client.wait_for("room_state")
+
+            rec.timed("socket.join_room", join)
+
+        def ready():
+            for name, client in zip(names, clients):
+                client.emit("player_ready", {"roomCode": code, "username": name})
+            host.wait_for("match_started")
+
+        rec.timed("socket.player_ready", ready)
+
+        for step in range(progress_events):
+            for name, client in zip(names, clients):
+                score = step * 100 / max(1, progress_events)
+                rec.timed("socket.match_progress", client.emit, "match_progress",
+                          {"roomCode": code, "username": name, "score": score})
+
+        def finish():
+            for name, client in zip(names, clients):
+                client.emit("finish_match", {"roomCode": code, "username": name,
+                                             "finalScore": random.uniform(20, 100),
+                                             "avgReactionMs": random.uniform(200, 900)})
+            host.wait_for("match_finished")
+
+        rec.timed("socket.finish_match", finish)
+    except Exception:
+        rec.error("room_flow")
+    finally:
+        for client in clients:
+            client.close()
+
+
+def run_submit(make_client, rec: Recorder, idx: int) -> None:
+    client = make_client()
+    try:
+        rec.timed("http.submit_score", client.post, "/api/submit_score", {
+            "username": f"lt_submit_{idx % 500}",
+            "testType": "mixed",
+            "accuracy": random.random(),
+            "avgReactionMs": random.uniform(150, 1400),
+            "details": [
+                {"testType": "math", "correct": True, "reactionMs": random.uniform(150, 1400), "accuracy": 1}
+                for _ in range(10)
+            ],
+        })
+    except Exception:
+        rec.error("submit_score")
+    finally:
+        client.close()
+
+
+def load_local_app(db_path: str):
+    os.environ["BRAIN_SPEED_DB"] = db_path
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import app as app_module
+
+    with app_module.app.app_context():
+        app_module.init_db()
+        app_module.PERCENTILES.ensure_loaded()
+    return app_module
+
+
+def max_rss_kb() -> int | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(args) -> dict:
+    if args.url:
+        make_client = lambda: RemoteClient(args.url)  # noqa: E731
+        metrics_client = RemoteClient(args.url)
+        metrics = lambda: json.loads(urllib.request.urlopen(args.url.rstrip("/") + "/api/metrics").read())  # noqa: E731
+    else:
+        tmp = tempfile.mkdtemp(prefix="brain_speed_lt_")
+        app_module = load_local_app(os.path.join(tmp, "loadtest.db"))
+        make_client = lambda: LocalClient(app_module)  # noqa: E731
+        metrics_client = None
+        metrics = lambda: app_module.app.test_client().get("/api/metrics").get_json()  # noqa: E731
+
+    random.seed(args.seed)
+    rec = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_room, make_client, rec, i, args.players, args.progress)
+            for i in range(args.rooms)
+        ]
+        futures += [pool.submit(run_submit, make_client, rec, i) for i in range(args.submits)]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - start
+
+    if metrics_client is not None:
+        metrics_client.close()
+    server = metrics()
+    return {
+        "config": {
+            "mode": "remote" if args.url else "local",
+            "rooms": args.rooms,
+            "players": args.players,
+            "progress": args.progress,
+            "submits": args.submits,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "wallSeconds": round(wall, 3),
+        "throughput": {
+            "eventsPerSec": round(rec.events / wall, 1),
+            "roomsPerSec": round(args.rooms / wall, 2),
+        },
+        "ops": {name: summarize(values) for name, values in sorted(rec.samples.items())},
+        "errors": rec.errors,
+        "memory": {"clientMaxRssKb": max_rss_kb(), "server": server.get("rooms", {})},
+    }
+
+
+# ------------------------------------------------------------
+# Raporlama
+# ------------------------------------------------------------
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    print(f"mod={report['config']['mode']} süre={report['wallSeconds']}s "
+          f"event/s={report['throughput']['eventsPerSec']} oda/s={report['throughput']['roomsPerSec']}")
+    header = f"{'op':<24}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    if baseline:
+        header += f"{'Δp95':>10}"
+    print(header)
+    for name, stats in report["ops"].items():
+        line = (f"{name:<24}{stats['count']:>7}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+                f"{stats['p99']:>10.2f}{stats['max']:>10.2f}")
+        base = (baseline or {}).get("ops", {}).get(name)
+        if base and base["p95"]:
+            line += f"{(stats['p95'] - base['p95']) / base['p95'] * 100:>+9.1f}%"
+        print(line)
+    if report["errors"]:
+        print(f"hatalar: {report['errors']}")
+    print(f"bellek: {report['memory']}")
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for name, stats in report["ops"].items():
+        base = baseline.get("ops", {}).get(name)
+        if base and base["p95"] and stats["p95"] > base["p95"] * (1 + tolerance):
+            found.append(f"{name} p95 {base['p95']:.2f} -> {stats['p95']:.2f} ms")
+    base_tp = baseline.get("throughput", {}).get("eventsPerSec")
+    if base_tp and report["throughput"]["eventsPerSec"] < base_tp * (1 - tolerance):
+        found.append(f"eventsPerSec {base_tp} -> {report['throughput']['eventsPerSec']}")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="brain_speed Socket.IO yük testi")
+    parser.add_argument("--url", help="çalışan sunucu (verilmezse süreç içi mod)")
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--players", type=int, default=4, choices=range(2, 5))
+    parser.add_argument("--progress", type=int, default=20, help="oyuncu başına match_progress sayısı")
+    parser.add_argument("--submits", type=int, default=200, help="ek /api/submit_score isteği")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="sonucu JSON baseline olarak kaydet")
+    parser.add_argument("--compare", help="karşılaştırılacak baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="izin verilen p95/throughput gerilemesi")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2))
+        print(f"baseline kaydedildi: {args.save}")
+
+    if baseline:
+        found = regressions(report, baseline, args.tolerance)
+        for line in found:
+            print(f"GERİLEME: {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
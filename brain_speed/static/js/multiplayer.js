@@ -1,15 +1,19 @@
 window.Multiplayer = (() => {
   const socket = io();
   let roomCode = null;
+  const liveScores = new Map();
 
   socket.on('connect', () => console.log('socket connected'));
   socket.on('room_state', (room) => renderRoom(room));
   socket.on('live_progress', payload => {
+    // Sunucu her tikte yalnızca skoru değişen oyuncuları gönderir.
+    payload.players.forEach(p => liveScores.set(p.username, p.score));
     const info = document.getElementById('roomInfo');
     if (!info) return;
-    info.innerHTML = payload.players.map(p => `${p.username}: <b>${p.score.toFixed(1)}</b>`).join('<br>');
+    info.innerHTML = [...liveScores].map(([username, score]) => `${username}: <b>${score.toFixed(1)}</b>`).join('<br>');
   });
   socket.on('match_started', ({ roomCode: code }) => {
+    liveScores.clear();
     notify(`Maç başladı: ${code}`);
   });
   socket.on('match_finished', (payload) => {
@@ -11,17 +11,21 @@ Bu dosya aşağıdaki görevleri üstlenir:
 
 from __future__ import annotations
 
+import atexit
 import json
+import math
 import os
+import queue
 import sqlite3
+import threading
+import time
 import uuid
-from contextlib import closing
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import Flask, g, jsonify, render_template, request, send_from_directory
 
 # ---------------------------------------------------------------------------
 # Flask application configuration
@@ -31,6 +35,12 @@ DB_PATH = BASE_DIR / "stories.db"
 STATIC_DIR = BASE_DIR / "static"
 TEMPLATES_DIR = BASE_DIR / "templates"
 
+DB_POOL_SIZE = int(os.environ.get("EMOJI_STORY_DB_POOL", "8"))
+DB_MMAP_SIZE = int(os.environ.get("EMOJI_STORY_DB_MMAP", str(256 * 1024 * 1024)))
+DB_CACHE_KB = int(os.environ.get("EMOJI_STORY_DB_CACHE_KB", "16000"))
+TREND_DECAY_SECONDS = float(os.environ.get("EMOJI_STORY_TREND_DECAY", "45000"))
+TRENDING_CACHE_TTL = float(os.environ.get("EMOJI_STORY_TRENDING_TTL", "5"))
+
 app = Flask(__name__, static_folder=str(STATIC_DIR), template_folder=str(TEMPLATES_DIR))
 app.config["JSON_AS_ASCII"] = False
 
@@ -54,17 +64,103 @@ class StoryPayload:
 # Database layer
 # ---------------------------------------------------------------------------
 
+# Ham etkileşim: trending sıralamasının girdisi.
+ENGAGEMENT_SQL = "score * 2 + shares * 4 + exports * 3 + plays"
+# Decay'in sıfır noktası; yalnızca skorları küçük tutmak için (2023-11-14 UTC).
+TREND_EPOCH = 1_700_000_000
+
+
+def trend_score(engagement: float, created_at: str) -> float:
+    """Reddit "hot" tarzı zamanla sönen trending skoru.
+
+    log10(etkileşim) + oluşturulma zamanı / TREND_DECAY_SECONDS. Yeni
+    hikayeler zaman bonusuyla başladığı için eski viral hikayeler kendiliğinden
+    geriler; değer yalnızca sayaçlar değişince yeniden hesaplanır ve index'lenir.
+    """
+    created = datetime.fromisoformat(created_at).timestamp()
+    return math.log10(max(engagement or 0, 1)) + (created - TREND_EPOCH) / TREND_DECAY_SECONDS
+
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={DB_MMAP_SIZE}",
+    f"PRAGMA cache_size=-{DB_CACHE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """Yeniden kullanılan SQLite bağlantıları havuzu.
+
+    Pragmalar bağlantı açılırken bir kez uygulanır; bağlantılar istekler
+    arasında yaşadığı için prepared statement önbelleği de sıcak kalır.
+    Her istek (app context) tek bağlantı alır ve teardown'da geri bırakır.
+    """
+
+    def __init__(self, db_path: Path, size: int = DB_POOL_SIZE) -> None:
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("trend_score", 2, trend_score, deterministic=True)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Yarım kalan transaction'ı geri alır; havuz doluysa bağlantıyı kapatır."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() >= self.size:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+DB_POOL = ConnectionPool(DB_PATH)
+atexit.register(DB_POOL.close_all)
+
+
 def get_db() -> sqlite3.Connection:
-    """SQLite bağlantısı döner ve row factory ile dict-benzeri erişim açılır."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    return conn
+    """İstek boyunca kullanılacak havuz bağlantısını döner.
+
+    Aynı istekteki tüm çağrılar aynı bağlantıyı alır; bağlantı kapatılmaz,
+    `release_db` teardown'da havuza iade eder. `with get_db() as conn:`
+    bloğu hata durumunda transaction'ı geri alır.
+    """
+    if "db" not in g:
+        g.db = DB_POOL.acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc: Optional[BaseException]) -> None:
+    conn = g.pop("db", None)
+    if conn is not None:
+        DB_POOL.release(conn)
 
 
 def create_tables() -> None:
     """Uygulama için gereken tüm tabloları oluşturur."""
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS stories (
@@ -81,6 +177,7 @@ def create_tables() -> None:
                 shares INTEGER NOT NULL DEFAULT 0,
                 exports INTEGER NOT NULL DEFAULT 0,
                 plays INTEGER NOT NULL DEFAULT 0,
+                trend_score REAL NOT NULL DEFAULT 0,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL
             );
@@ -106,9 +203,23 @@ def create_tables() -> None:
             CREATE INDEX IF NOT EXISTS idx_analytics_event_name ON analytics_events(event_name);
             """
         )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(stories)")}
+        if "trend_score" not in columns:
+            # Eski veritabanı: kolonu ekle ve mevcut hikayeleri bir kez skorla.
+            conn.execute("ALTER TABLE stories ADD COLUMN trend_score REAL NOT NULL DEFAULT 0")
+            conn.execute(f"UPDATE stories SET trend_score = trend_score({ENGAGEMENT_SQL}, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stories_trend ON stories(trend_score DESC)")
         conn.commit()
 
 
+def refresh_trend_score(conn: sqlite3.Connection, story_id: str) -> None:
+    """Sayaç değişiminden sonra hikayenin saklı trending skorunu günceller."""
+    conn.execute(
+        f"UPDATE stories SET trend_score = trend_score({ENGAGEMENT_SQL}, created_at) WHERE id = ?",
+        (story_id,),
+    )
+
+
 def now_iso() -> str:
     """UTC ISO timestamp üretir."""
     return datetime.now(tz=timezone.utc).isoformat()
@@ -209,7 +320,7 @@ def list_stories() -> Any:
     query += " ORDER BY created_at DESC LIMIT ?"
     params.append(limit)
 
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         rows = conn.execute(query, params).fetchall()
 
     return jsonify({"items": [row_to_story(r) for r in rows]})
@@ -227,14 +338,14 @@ def create_story() -> Any:
     story_id = str(uuid.uuid4())
     now = now_iso()
 
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         conn.execute(
             """
             INSERT INTO stories (
                 id, title, text, emoji_sequence, language, mood,
-                author_name, duration_seconds, theme, score,
+                author_name, duration_seconds, theme, score, trend_score,
                 created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 story_id,
@@ -247,6 +358,7 @@ def create_story() -> Any:
                 story.duration_seconds,
                 story.theme,
                 story.score,
+                trend_score(story.score * 2, now),
                 now,
                 now,
             ),
@@ -259,7 +371,7 @@ def create_story() -> Any:
 @app.route("/api/stories/<story_id>", methods=["GET"])
 def get_story(story_id: str) -> Any:
     """Tek hikaye detayını getirir."""
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         row = conn.execute("SELECT * FROM stories WHERE id = ?", (story_id,)).fetchone()
 
     if not row:
@@ -284,7 +396,7 @@ def log_story_event(story_id: str) -> Any:
     }
     now = now_iso()
 
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         story_exists = conn.execute(
             "SELECT 1 FROM stories WHERE id = ?", (story_id,)
         ).fetchone()
@@ -297,6 +409,7 @@ def log_story_event(story_id: str) -> Any:
                 f"UPDATE stories SET {col} = {col} + 1, updated_at = ? WHERE id = ?",
                 (now, story_id),
             )
+            refresh_trend_score(conn, story_id)
 
         conn.execute(
             """
@@ -310,17 +423,38 @@ def log_story_event(story_id: str) -> Any:
     return jsonify({"message": "event logged"})
 
 
-@app.route("/api/trending", methods=["GET"])
-def trending() -> Any:
-    """Skor + etkileşim ağırlıklı trending listesi."""
-    limit = min(int(request.args.get("limit", 10)), 50)
-    with closing(get_db()) as conn:
+class TrendingCache:
+    """En üstteki TRENDING_MAX_LIMIT hikayeyi kısa süre bellekte tutar.
+
+    Sayaç güncellemeleri sık olduğundan önbellek yazımlarda silinmez; en
+    fazla `ttl` saniye eski liste döner.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._items: List[Dict[str, Any]] = []
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, limit: int) -> List[Dict[str, Any]]:
+        if time.monotonic() >= self._expires:
+            with self._lock:
+                if time.monotonic() >= self._expires:
+                    self._items = load_trending(TRENDING_MAX_LIMIT)
+                    self._expires = time.monotonic() + self.ttl
+        return self._items[:limit]
+
+
+TRENDING_MAX_LIMIT = 50
+
+
+def load_trending(limit: int) -> List[Dict[str, Any]]:
+    with get_db() as conn:
         rows = conn.execute(
-            """
-            SELECT *,
-                (score * 2 + shares * 4 + exports * 3 + plays) AS trend_score
+            f"""
+            SELECT *, ({ENGAGEMENT_SQL}) AS engagement
             FROM stories
-            ORDER BY trend_score DESC, created_at DESC
+            ORDER BY trend_score DESC
             LIMIT ?
             """,
             (limit,),
@@ -329,16 +463,26 @@ def trending() -> Any:
     items: List[Dict[str, Any]] = []
     for row in rows:
         item = row_to_story(row)
-        item["trend_score"] = row["trend_score"]
+        item["trend_score"] = round(row["trend_score"], 4)
+        item["engagement"] = row["engagement"]
         items.append(item)
+    return items
+
+
+TRENDING_CACHE = TrendingCache(TRENDING_CACHE_TTL)
 
-    return jsonify({"items": items})
+
+@app.route("/api/trending", methods=["GET"])
+def trending() -> Any:
+    """Zamanla sönen, saklı ve index'li trending skoruna göre liste."""
+    limit = min(int(request.args.get("limit", 10)), TRENDING_MAX_LIMIT)
+    return jsonify({"items": TRENDING_CACHE.get(limit)})
 
 
 @app.route("/api/analytics/summary", methods=["GET"])
 def analytics_summary() -> Any:
     """Basit toplam metrikleri döndürür."""
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         totals = conn.execute(
             """
             SELECT
@@ -377,7 +521,7 @@ def subscribe_push() -> Any:
     if not endpoint:
         return jsonify({"error": "endpoint required"}), 400
 
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         conn.execute(
             """
             INSERT INTO push_subscriptions (endpoint, payload_json, created_at)
@@ -430,7 +574,7 @@ def seed_demo_data() -> Any:
     ]
 
     inserted = 0
-    with closing(get_db()) as conn:
+    with get_db() as conn:
         for payload in demo:
             story_id = str(uuid.uuid4())
             now = now_iso()
@@ -438,8 +582,8 @@ def seed_demo_data() -> Any:
                 """
                 INSERT INTO stories (
                     id, title, text, emoji_sequence, language, mood,
-                    author_name, duration_seconds, theme, score, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    author_name, duration_seconds, theme, score, trend_score, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     story_id,
@@ -452,6 +596,7 @@ def seed_demo_data() -> Any:
                     15,
                     payload["theme"],
                     payload["score"],
+                    trend_score(payload["score"] * 2, now),
                     now,
                     now,
                 ),
@@ -465,7 +610,8 @@ def seed_demo_data() -> Any:
 def bootstrap() -> None:
     """Uygulama ayağa kalkmadan önce gerekli hazırlıkları yapar."""
     os.makedirs(STATIC_DIR, exist_ok=True)
-    create_tables()
+    with app.app_context():
+        create_tables()
 
 
 bootstrap()
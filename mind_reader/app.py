@@ -1,8 +1,21 @@
+import atexit
+import math
 import os
 import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_socketio import SocketIO, emit, join_room, leave_room
+import numpy as np
+
+from dbwriter import DbWriter
+from replay import ReplayLog, created_at
+from roomcodes import RoomCodeAllocator
+from synchrony import synchrony
+from throttle import RateLimiter, ReactionCoalescer
+from timeseries import SampleBuffer, windowed_features
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "games.db")
@@ -12,6 +25,51 @@ app.config["SECRET_KEY"] = "mind-reader-neon-secret"
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
 
 rooms = {}
+# sid -> (room_code, role); disconnect'te odayı taramadan bulmak için
+sid_index = {}
+# Boş odalar, boşaldıkları zamana göre sıralı: room_code -> empty_since
+empty_rooms = {}
+ROOM_EMPTY_TTL = float(os.environ.get("ROOM_EMPTY_TTL", "300"))
+ROOM_SWEEP_INTERVAL = float(os.environ.get("ROOM_SWEEP_INTERVAL", "30"))
+_background_started = False
+# 4'ten büyük değerler "audience mode" odalarını açar.
+MAX_PLAYERS = int(os.environ.get("MAX_PLAYERS", "4"))
+# Çift skorları yalnızca küçük odalarda yayınlanır (n² büyür).
+MAX_PAIR_BROADCAST = 8
+DEFAULT_EMOTION = [0.33, 0.33, 0.34]
+# Oyuncu başına thought_data tamponu (sid -> SampleBuffer) ve skor penceresi.
+player_buffers = {}
+THOUGHT_BUFFER_SIZE = int(os.environ.get("THOUGHT_BUFFER_SIZE", "256"))
+SYNC_WINDOW = float(os.environ.get("SYNC_WINDOW", "10"))
+SYNC_BINS = 20
+# sid başına event hız sınırları (mesaj/sn, burst) ve reaksiyon yayın aralığı.
+THOUGHT_RATE = float(os.environ.get("THOUGHT_RATE", "10"))
+REACTION_RATE = float(os.environ.get("REACTION_RATE", "5"))
+REACTION_FLUSH_INTERVAL = float(os.environ.get("REACTION_FLUSH_INTERVAL", "0.2"))
+metrics = Counter()
+limiter = RateLimiter(
+    {"thought_data": (THOUGHT_RATE, THOUGHT_RATE * 2), "reaction": (REACTION_RATE, REACTION_RATE * 2)},
+    metrics,
+)
+reactions = ReactionCoalescer(metrics)
+# Oda kodları bellekte dağıtılır; DB yazımları ayrı bir thread'de yapılır.
+code_allocator = RoomCodeAllocator()
+db_writer = DbWriter(DB_PATH, linger=float(os.environ.get("DB_WRITER_LINGER", "0.02")))
+atexit.register(db_writer.close)
+# Tur girdilerinin ikili kaydı (replay.py ile yeniden skorlanır); isteğe bağlıdır,
+# REPLAY_LOG=replay.bin ile açılır. Dosya REPLAY_LOG_MAX_MB'ı aşınca döndürülür.
+REPLAY_LOG_PATH = os.environ.get("REPLAY_LOG", "")
+replay_log = (
+    ReplayLog(
+        REPLAY_LOG_PATH,
+        max_bytes=int(float(os.environ.get("REPLAY_LOG_MAX_MB", "256")) * (1 << 20)),
+        backups=int(os.environ.get("REPLAY_LOG_BACKUPS", "4")),
+    )
+    if REPLAY_LOG_PATH
+    else None
+)
+if replay_log:
+    atexit.register(replay_log.close)
 
 
 def get_db_conn():
@@ -41,20 +99,224 @@ def init_db():
         );
         """
     )
+    conn.executescript(PLAYER_STATS_SCHEMA)
+    has_scores = conn.execute("SELECT 1 FROM scores LIMIT 1").fetchone()
+    no_stats = conn.execute("SELECT 1 FROM player_stats LIMIT 1").fetchone() is None
+    if has_scores and no_stats:
+        # player_stats sonradan eklendi; geçmişi bir kez doldur.
+        conn.executescript(PLAYER_STATS_BACKFILL)
     conn.commit()
     conn.close()
 
 
+# Oyuncu başına toplam/adet/en iyi skor; room_code = '' global satırdır.
+# scores insert'i ile aynı transaction'da trigger günceller, leaderboard
+# okumaları geçmişi taramaz.
+PLAYER_STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    room_code TEXT NOT NULL,
+    player_name TEXT NOT NULL,
+    total_score REAL NOT NULL,
+    plays INTEGER NOT NULL,
+    best_score REAL NOT NULL,
+    avg_score REAL NOT NULL,
+    PRIMARY KEY (room_code, player_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_player_stats_avg ON player_stats(room_code, avg_score DESC);
+
+CREATE TRIGGER IF NOT EXISTS trg_scores_player_stats AFTER INSERT ON scores
+BEGIN
+    INSERT INTO player_stats (room_code, player_name, total_score, plays, best_score, avg_score)
+    VALUES ('', NEW.player_name, NEW.score, 1, NEW.score, NEW.score),
+           (NEW.room_code, NEW.player_name, NEW.score, 1, NEW.score, NEW.score)
+    ON CONFLICT(room_code, player_name) DO UPDATE SET
+        total_score = total_score + excluded.total_score,
+        plays = plays + 1,
+        best_score = max(best_score, excluded.best_score),
+        avg_score = (total_score + excluded.total_score) / (plays + 1);
+END;
+"""
+
+PLAYER_STATS_BACKFILL = """
+INSERT INTO player_stats (room_code, player_name, total_score, plays, best_score, avg_score)
+SELECT '', player_name, SUM(score), COUNT(*), MAX(score), AVG(score) FROM scores GROUP BY player_name;
+INSERT INTO player_stats (room_code, player_name, total_score, plays, best_score, avg_score)
+SELECT room_code, player_name, SUM(score), COUNT(*), MAX(score), AVG(score) FROM scores
+GROUP BY room_code, player_name;
+"""
+
+
+class LeaderboardCache:
+    """Kapsam ('' = global ya da oda kodu) başına kısa ömürlü sonuç önbelleği.
+
+    Kapsam istemciden gelen `?room=` değeridir; en fazla `maxsize` kapsam
+    LRU sırasıyla tutulur, böylece rastgele oda kodları belleği büyütemez.
+    `invalidate` yazıcı thread'inden çağrıldığı için erişim kilit altındadır.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(scope)
+                return entry[1]
+        value = load(scope)
+        with self._lock:
+            self._entries[scope] = (now + self.ttl, value)
+            self._entries.move_to_end(scope)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, room_code):
+        with self._lock:
+            self._entries.pop("", None)
+            self._entries.pop(room_code, None)
+
+
+LEADERBOARD_TTL = float(os.environ.get("LEADERBOARD_TTL", "5"))
+LEADERBOARD_CACHE_SIZE = int(os.environ.get("LEADERBOARD_CACHE_SIZE", "1024"))
+leaderboard_cache = LeaderboardCache(LEADERBOARD_TTL, LEADERBOARD_CACHE_SIZE)
+
+
+SCORE_INSERT_SQL = "INSERT INTO scores (room_code, player_name, score, category, created_at) VALUES (?, ?, ?, ?, ?)"
+
+
+def finite_float(value, default):
+    """`value` sonlu bir sayıysa onu, değilse (NaN/inf/geçersiz) `default`'u döner."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if math.isfinite(number) else default
+
+
+def emotion_vector(value, default=DEFAULT_EMOTION):
+    try:
+        vec = [float(x) for x in value]
+    except (TypeError, ValueError):
+        return default
+    if len(vec) != len(DEFAULT_EMOTION) or not all(math.isfinite(x) for x in vec):
+        return default
+    return vec
+
+
+def new_room():
+    # next_slot: oyuncuya katılımda verilen, odada tekrar etmeyen numara (replay anahtarı).
+    return {"players": {}, "spectators": set(), "state": "lobby", "seq": 0, "next_slot": 0}
+
+
+def get_or_create_room(room_code):
+    room = rooms.get(room_code)
+    if room is None:
+        room = rooms[room_code] = new_room()
+        mark_empty(room_code)
+    return room
+
+
+def mark_empty(room_code):
+    empty_rooms.pop(room_code, None)
+    empty_rooms[room_code] = time.time()
+
+
+def public_player(sid, pdata):
+    # emotion/pupil/timing sunucuda kalır; istemciler yalnızca bunları çizer.
+    return {"sid": sid, "name": pdata["name"], "score": pdata["score"]}
+
+
+def room_snapshot(room):
+    return {
+        "seq": room["seq"],
+        "players": [public_player(psid, pdata) for psid, pdata in room["players"].items()],
+        "spectator_count": len(room["spectators"]),
+        "state": room["state"],
+    }
+
+
+def broadcast_delta(room_code, room, ops, include_self=True):
+    """Oda durumundaki değişikliği sıra numarasıyla tüm odaya yayınlar.
+
+    İstemci `seq`'in bir öncekinin devamı olmadığını görürse `resync` ister
+    ve yeni bir `room_snapshot` alır.
+    """
+    room["seq"] += 1
+    emit("room_delta", {"seq": room["seq"], "ops": ops}, room=room_code, include_self=include_self)
+
+
+def remove_sid(sid):
+    entry = sid_index.pop(sid, None)
+    if entry is None:
+        return
+    room_code, role = entry
+    limiter.forget(sid)
+    room = rooms.get(room_code)
+    leave_room(room_code, sid=sid)
+    if room is None:
+        return
+    if role == "spectator":
+        room["spectators"].discard(sid)
+        broadcast_delta(room_code, room, [{"op": "spectators", "count": len(room["spectators"])}])
+    elif room["players"].pop(sid, None) is not None:
+        player_buffers.pop(sid, None)
+        broadcast_delta(room_code, room, [{"op": "player_removed", "sid": sid}])
+    if not room["players"] and not room["spectators"]:
+        mark_empty(room_code)
+
+
+def sweep_empty_rooms(now=None):
+    now = now or time.time()
+    expired = []
+    for room_code, since in empty_rooms.items():
+        if now - since < ROOM_EMPTY_TTL:
+            break
+        expired.append(room_code)
+    for room_code in expired:
+        del empty_rooms[room_code]
+        rooms.pop(room_code, None)
+    return len(expired)
+
+
+def flush_reactions():
+    for room_code, batch in reactions.drain().items():
+        socketio.emit("reactions", {"items": batch}, to=room_code)
+        metrics["emitted.reactions"] += 1
+
+
+def ensure_background_tasks():
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+
+    def sweep_loop():
+        while True:
+            socketio.sleep(ROOM_SWEEP_INTERVAL)
+            sweep_empty_rooms()
+
+    def reaction_loop():
+        while True:
+            socketio.sleep(REACTION_FLUSH_INTERVAL)
+            flush_reactions()
+
+    socketio.start_background_task(sweep_loop)
+    socketio.start_background_task(reaction_loop)
+
+
+def warm_room_codes():
+    conn = get_db_conn()
+    code_allocator.warm(row[0] for row in conn.execute("SELECT room_code FROM rooms"))
+    conn.close()
+
+
 def generate_room_code():
-    import random
-    import string
-    while True:
-        code = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        conn = get_db_conn()
-        exists = conn.execute("SELECT 1 FROM rooms WHERE room_code = ?", (code,)).fetchone()
-        conn.close()
-        if not exists:
-            return code
+    return code_allocator.allocate(in_use=rooms)
 
 
 @app.route("/")
@@ -67,51 +329,65 @@ def create_room():
     data = request.get_json(force=True)
     name = data.get("name", "Anon")[:24]
     room_code = generate_room_code()
-
-    conn = get_db_conn()
-    conn.execute(
-        "INSERT INTO rooms (room_code, created_at, created_by) VALUES (?, ?, ?)",
+    db_writer.submit(
+        # OR IGNORE: kod tekrar verilirse aynı batch'teki skorlar düşmesin.
+        "INSERT OR IGNORE INTO rooms (room_code, created_at, created_by) VALUES (?, ?, ?)",
         (room_code, datetime.utcnow().isoformat(), name),
     )
-    conn.commit()
-    conn.close()
 
-    rooms[room_code] = {"players": {}, "spectators": set(), "state": "lobby"}
+    get_or_create_room(room_code)
+    ensure_background_tasks()
     return jsonify({"room_code": room_code})
 
 
-@app.route("/api/leaderboard")
-def leaderboard():
+def load_player_board(scope):
     conn = get_db_conn()
-    global_top = conn.execute(
-        """
-        SELECT player_name, ROUND(AVG(score), 2) avg_score, COUNT(*) plays
-        FROM scores
-        GROUP BY player_name
-        HAVING plays >= 1
-        ORDER BY avg_score DESC
-        LIMIT 20
+    rows = conn.execute(
         """
+        SELECT player_name, ROUND(avg_score, 2) avg_score, plays, ROUND(best_score, 2) best_score
+        FROM player_stats
+        WHERE room_code = ?
+        ORDER BY player_stats.avg_score DESC
+        LIMIT ?
+        """,
+        (scope, 20 if scope == "" else 10),
     ).fetchall()
-    room_code = request.args.get("room")
-    room_top = []
-    if room_code:
-        room_top = conn.execute(
-            """
-            SELECT player_name, ROUND(AVG(score), 2) avg_score, COUNT(*) plays
-            FROM scores
-            WHERE room_code = ?
-            GROUP BY player_name
-            ORDER BY avg_score DESC
-            LIMIT 10
-            """,
-            (room_code,),
-        ).fetchall()
     conn.close()
+    return [dict(row) for row in rows]
+
+
+@app.route("/api/leaderboard")
+def leaderboard():
+    room_code = request.args.get("room")
     return jsonify(
         {
-            "global": [dict(row) for row in global_top],
-            "friends": [dict(row) for row in room_top],
+            "global": leaderboard_cache.get("", load_player_board),
+            "friends": leaderboard_cache.get(room_code, load_player_board) if room_code else [],
+        }
+    )
+
+
+@app.route("/api/metrics")
+def metrics_view():
+    return jsonify(
+        {
+            "rooms": len(rooms),
+            "emptyRooms": len(empty_rooms),
+            "connections": len(sid_index),
+            "rateLimitedSids": len(limiter),
+            "roomCodesTaken": len(code_allocator),
+            "replayLog": (
+                {"written": replay_log.written, "dropped": replay_log.dropped, "skipped": replay_log.skipped}
+                if replay_log
+                else None
+            ),
+            "dbWriter": {
+                "written": db_writer.written,
+                "batches": db_writer.batches,
+                "dropped": db_writer.dropped,
+                "errors": db_writer.errors,
+            },
+            "counters": dict(metrics),
         }
     )
 
@@ -132,37 +408,38 @@ def on_join(data):
     name = data.get("name", "Anon")[:24]
     role = data.get("role", "player")
 
-    if room_code not in rooms:
-        rooms[room_code] = {"players": {}, "spectators": set(), "state": "lobby"}
-
-    room = rooms[room_code]
+    room = get_or_create_room(room_code)
     sid = request.sid
+    ensure_background_tasks()
 
-    if role == "player" and len(room["players"]) >= 4:
+    if role == "player" and len(room["players"]) >= MAX_PLAYERS and sid not in room["players"]:
         emit("join_error", {"message": "Room full. Join as spectator."})
         return
 
+    # Aynı bağlantı başka bir odaya/role geçiyorsa önce eski kaydı kaldır.
+    remove_sid(sid)
     join_room(room_code)
+    sid_index[sid] = (room_code, "spectator" if role == "spectator" else "player")
+    empty_rooms.pop(room_code, None)
     if role == "spectator":
         room["spectators"].add(sid)
+        op = {"op": "spectators", "count": len(room["spectators"])}
     else:
         room["players"][sid] = {
             "name": name,
-            "emotion": [0.33, 0.33, 0.34],
+            "emotion": list(DEFAULT_EMOTION),
             "pupil": 0.5,
             "timing": None,
             "score": 0,
+            "slot": room["next_slot"],
         }
+        room["next_slot"] += 1
+        player_buffers[sid] = SampleBuffer(THOUGHT_BUFFER_SIZE)
+        op = {"op": "player_added", "player": public_player(sid, room["players"][sid])}
 
-    emit(
-        "room_state",
-        {
-            "players": [{"sid": psid, **pdata} for psid, pdata in room["players"].items()],
-            "spectator_count": len(room["spectators"]),
-            "state": room["state"],
-        },
-        room=room_code,
-    )
+    # Katılan istemci delta yerine güncel snapshot'ı alır.
+    broadcast_delta(room_code, room, [op], include_self=False)
+    emit("room_snapshot", room_snapshot(room))
     emit("joined", {"sid": sid, "room_code": room_code, "role": role})
 
 
@@ -175,20 +452,33 @@ def on_signal(data):
 
 @socketio.on("reaction")
 def on_reaction(data):
-    room_code = data.get("room_code")
-    emit("reaction", {"from": request.sid, "emoji": data.get("emoji", "🧠")}, room=room_code)
+    sid = request.sid
+    entry = sid_index.get(sid)
+    if entry is None or not limiter.allow(sid, "reaction"):
+        return
+    reactions.add(entry[0], sid, str(data.get("emoji", "🧠"))[:8])
 
 
 @socketio.on("thought_data")
 def on_thought_data(data):
-    room_code = data.get("room_code")
-    player = rooms.get(room_code, {}).get("players", {}).get(request.sid)
-    if not player:
+    sid = request.sid
+    entry = sid_index.get(sid)
+    buffer = player_buffers.get(sid)
+    if entry is None or buffer is None or not limiter.allow(sid, "thought_data"):
         return
+    player = rooms[entry[0]]["players"][sid]
 
-    player["emotion"] = data.get("emotion", player["emotion"])
-    player["pupil"] = float(data.get("pupil", player["pupil"]))
-    player["timing"] = float(data.get("timing", datetime.utcnow().timestamp()))
+    now = time.time()
+    # NaN/inf tek bir oyuncuyla tüm odanın skorunu bozar; önceki değere düşülür.
+    emotion = emotion_vector(data.get("emotion"), player["emotion"])
+    pupil = finite_float(data.get("pupil"), player["pupil"])
+    timing = finite_float(data.get("timing", now), now if player["timing"] is None else player["timing"])
+    buffer.push(now, timing, pupil, emotion[0], emotion[1], emotion[2])
+    if replay_log:
+        replay_log.sample(entry[0], player["slot"], player["name"], now, timing, pupil, emotion[0], emotion[1], emotion[2])
+    player["emotion"] = emotion
+    player["pupil"] = pupil
+    player["timing"] = timing
 
 
 @socketio.on("submit_round")
@@ -200,81 +490,65 @@ def on_submit_round(data):
         return
 
     players = list(room["players"].items())
-    timings = [p[1]["timing"] for p in players if p[1]["timing"] is not None]
-    if not timings:
-        timings = [datetime.utcnow().timestamp()]
-    t_min, t_max = min(timings), max(timings)
-
-    def corr(a, b):
-        # tiny pearson approximation for 3 element vectors
-        import math
-
-        ma = sum(a) / len(a)
-        mb = sum(b) / len(b)
-        num = sum((x - ma) * (y - mb) for x, y in zip(a, b))
-        den_a = math.sqrt(sum((x - ma) ** 2 for x in a))
-        den_b = math.sqrt(sum((y - mb) ** 2 for y in b))
-        if den_a == 0 or den_b == 0:
-            return 0
-        return max(-1.0, min(1.0, num / (den_a * den_b)))
-
-    pair_scores = []
-    for i in range(len(players)):
-        for j in range(i + 1, len(players)):
-            p1 = players[i][1]
-            p2 = players[j][1]
-            emotion_c = (corr(p1["emotion"], p2["emotion"]) + 1) / 2
-            pupil_sync = 1 - min(1, abs(p1["pupil"] - p2["pupil"]))
-            dt = abs((p1["timing"] or t_max) - (p2["timing"] or t_max))
-            timing_sync = 1 - min(1, dt / 5.0)
-            score = (emotion_c * 0.6) + (pupil_sync * 0.2) + (timing_sync * 0.2)
-            pair_scores.append(score)
-
-    group = sum(pair_scores) / len(pair_scores) if pair_scores else 0
-    group_score = round(group * 100, 2)
-
-    conn = get_db_conn()
-    now = datetime.utcnow().isoformat()
-    for sid, pdata in players:
-        pdata["score"] = group_score
-        conn.execute(
-            "INSERT INTO scores (room_code, player_name, score, category, created_at) VALUES (?, ?, ?, ?, ?)",
-            (room_code, pdata["name"], group_score, category, now),
-        )
-    conn.commit()
-    conn.close()
+    now = time.time()
+    fallbacks = [(emotion_vector(p["emotion"]), p["pupil"], p["timing"]) for _, p in players]
+    if replay_log:
+        replay_log.round_end(room_code, now, [(p["slot"], p["name"], *fb) for (_, p), fb in zip(players, fallbacks)])
+    emotions, pupils, timings = windowed_features(
+        [player_buffers.get(sid) for sid, _ in players],
+        fallbacks,
+        now=now,
+        window=SYNC_WINDOW,
+        bins=SYNC_BINS,
+    )
+    result = synchrony(emotions, pupils, timings, now=now)
+    group_score = round(result.group * 100, 2)
+    player_scores = np.round(result.players * 100, 2).tolist()
+
+    # replay kaydındaki tur zamanıyla aynı damga; replay.py turları bununla eşler.
+    scored_at = created_at(now)
+    for (_, pdata), score in zip(players, player_scores):
+        pdata["score"] = score
+    # Yazım yazıcı thread'inde odalar arası batch'lenir; handler diske gitmez.
+    db_writer.submit_many(
+        SCORE_INSERT_SQL,
+        [(room_code, pdata["name"], pdata["score"], category, scored_at) for _, pdata in players],
+        on_commit=lambda: leaderboard_cache.invalidate(room_code),
+    )
 
-    emit(
-        "round_result",
-        {
-            "group_score": group_score,
-            "players": [{"sid": sid, **pdata} for sid, pdata in players],
-            "category": category,
-        },
-        room=room_code,
+    broadcast_delta(
+        room_code,
+        room,
+        [{"op": "player_changed", "sid": sid, "fields": {"score": pdata["score"]}} for sid, pdata in players],
     )
+    payload = {"group_score": group_score, "category": category}
+    if len(players) <= MAX_PAIR_BROADCAST:
+        payload["pairs"] = [
+            {"a": players[i][0], "b": players[j][0], "score": round(score * 100, 2)}
+            for i, j, score in result.pairs()
+        ]
+    emit("round_result", payload, room=room_code)
+
+
+@socketio.on("resync")
+def on_resync(data=None):
+    entry = sid_index.get(request.sid)
+    room = rooms.get(entry[0]) if entry else None
+    if room is not None:
+        emit("room_snapshot", room_snapshot(room))
+
+
+@socketio.on("leave_room")
+def on_leave_room(data=None):
+    remove_sid(request.sid)
 
 
 @socketio.on("disconnect")
 def on_disconnect():
-    sid = request.sid
-    for room_code, room in rooms.items():
-        if sid in room["players"]:
-            del room["players"][sid]
-            leave_room(room_code)
-            emit(
-                "room_state",
-                {
-                    "players": [{"sid": psid, **pdata} for psid, pdata in room["players"].items()],
-                    "spectator_count": len(room["spectators"]),
-                    "state": room["state"],
-                },
-                room=room_code,
-            )
-        if sid in room["spectators"]:
-            room["spectators"].remove(sid)
+    remove_sid(request.sid)
 
 
 if __name__ == "__main__":
     init_db()
+    warm_room_codes()
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,102 @@
+"""Skor yazımı sırasında eventlet döngü gecikmesi benchmark'ı.
+
+Bir green thread sabit aralıkla uyuyup ne kadar geç uyandığını ölçer (diğer
+odaların göreceği gecikme). Aynı anda çok sayıda oda tur sonucu gönderir:
+
+- `sync`: eski yol; handler içinde bağlantı aç, executemany, commit.
+- `writer`: `DbWriter` kuyruğuna bırak; yazım gerçek bir thread'de batch'lenir.
+
+    python bench_persistence.py --rooms 200 --rounds 5 --players 4
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import eventlet
+import numpy as np
+
+import app as mind_reader
+from dbwriter import DbWriter
+
+
+def probe(samples: list, interval: float, stop: list) -> None:
+    while not stop:
+        start = time.perf_counter()
+        eventlet.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+def submit_sync(db_path: str, rows: list) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executemany(mind_reader.SCORE_INSERT_SQL, rows)
+    conn.commit()
+    conn.close()
+
+
+def run(mode: str, args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    mind_reader.DB_PATH = db_path
+    mind_reader.init_db()
+    writer = DbWriter(db_path, linger=args.linger)
+
+    def room(i: int) -> None:
+        for r in range(args.rounds):
+            rows = [(f"R{i:05d}", f"p{p}", 50.0 + p, "genel", f"2026-01-01T00:00:{r:02d}") for p in range(args.players)]
+            if mode == "sync":
+                submit_sync(db_path, rows)
+            else:
+                writer.submit_many(mind_reader.SCORE_INSERT_SQL, rows)
+            eventlet.sleep(0)
+
+    lags, stop = [], []
+    prober = eventlet.spawn(probe, lags, args.interval, stop)
+    eventlet.sleep(0.05)
+    start = time.perf_counter()
+    pool = eventlet.GreenPool(args.rooms)
+    for i in range(args.rooms):
+        pool.spawn(room, i)
+    pool.waitall()
+    handler_s = time.perf_counter() - start
+    # queue.join hub'ı bloklar; diske inişi döngüyü bırakarak bekle.
+    expected = args.rooms * args.rounds * args.players
+    while mode == "writer" and writer.written < expected:
+        eventlet.sleep(0.001)
+    total_s = time.perf_counter() - start
+    eventlet.sleep(0.05)
+    stop.append(True)
+    prober.wait()
+    writer.close()
+
+    stored = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+    lags = np.asarray(lags)
+    return {
+        "mode": mode,
+        "rows": stored,
+        "handlers_s": round(handler_s, 3),
+        "durable_s": round(total_s, 3),
+        "lag_p50_ms": round(float(np.percentile(lags, 50)), 2),
+        "lag_p99_ms": round(float(np.percentile(lags, 99)), 2),
+        "lag_max_ms": round(float(lags.max()), 2),
+        "batches": writer.batches if mode == "writer" else args.rooms * args.rounds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.005, help="prob uyku aralığı (sn)")
+    parser.add_argument("--linger", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for mode in ("sync", "writer"):
+        result = run(mode, args)
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
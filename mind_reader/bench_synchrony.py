@@ -0,0 +1,79 @@
+"""Telepati skoru benchmark'ı: eski döngü tabanlı hesap ile numpy sürümü.
+
+    python bench_synchrony.py                 # 4..500 katılımcı
+    python bench_synchrony.py --sizes 4 64    # belirli boyutlar
+
+Her boyutta iki sürümün grup skoru karşılaştırılır ve ortalama süreler
+milisaniye olarak yazdırılır. Döngü sürümü `--loop-max` üzerindeki
+boyutlarda atlanır.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from synchrony import EMOTION_WEIGHT, PUPIL_WEIGHT, TIMING_WEIGHT, TIMING_WINDOW, synchrony
+
+
+def loop_group_score(emotions, pupils, timings):
+    """`on_submit_round`'un önceki iç içe döngü uygulaması (referans)."""
+
+    def corr(a, b):
+        ma = sum(a) / len(a)
+        mb = sum(b) / len(b)
+        num = sum((x - ma) * (y - mb) for x, y in zip(a, b))
+        den_a = math.sqrt(sum((x - ma) ** 2 for x in a))
+        den_b = math.sqrt(sum((y - mb) ** 2 for y in b))
+        if den_a == 0 or den_b == 0:
+            return 0
+        return max(-1.0, min(1.0, num / (den_a * den_b)))
+
+    n = len(emotions)
+    t_max = max(timings)
+    pair_scores = []
+    for i in range(n):
+        for j in range(i + 1, n):
+            emotion_c = (corr(emotions[i], emotions[j]) + 1) / 2
+            pupil_sync = 1 - min(1, abs(pupils[i] - pupils[j]))
+            dt = abs((timings[i] or t_max) - (timings[j] or t_max))
+            timing_sync = 1 - min(1, dt / TIMING_WINDOW)
+            pair_scores.append(emotion_c * EMOTION_WEIGHT + pupil_sync * PUPIL_WEIGHT + timing_sync * TIMING_WEIGHT)
+    return sum(pair_scores) / len(pair_scores)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return (time.perf_counter() - start) * 1000 / repeat, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64, 128, 256, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--loop-max", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'n':>5} {'numpy ms':>10} {'loop ms':>10} {'speedup':>8} {'fark':>10}")
+    for n in args.sizes:
+        emotions = rng.dirichlet(np.ones(3), size=n)
+        pupils = rng.uniform(0.2, 0.8, size=n)
+        timings = 1_700_000_000 + rng.uniform(0, 8, size=n)
+
+        fast_ms, result = timed(lambda: synchrony(emotions, pupils, timings), args.repeat)
+        if n > args.loop_max:
+            print(f"{n:>5} {fast_ms:>10.3f} {'-':>10} {'-':>8} {'-':>10}")
+            continue
+        lists = (emotions.tolist(), pupils.tolist(), timings.tolist())
+        loop_ms, reference = timed(lambda: loop_group_score(*lists), max(1, args.repeat // 10))
+        diff = abs(result.group - reference)
+        print(f"{n:>5} {fast_ms:>10.3f} {loop_ms:>10.3f} {loop_ms / fast_ms:>7.1f}x {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Event döngüsü dışında çalışan SQLite yazıcısı.
+
+Uygulama eventlet ile çalışır ve monkey patch yapılmaz; `threading.Thread`
+gerçek bir OS thread'idir. Handler'lar yazımları `submit` ile kuyruğa bırakıp
+hemen döner; yazıcı thread kendi bağlantısıyla ardışık aynı SQL'leri tek
+`executemany` ve tek transaction'da işler, böylece diske gidiş green-thread
+hub'ını hiç bloklamaz. İlk yazımdan sonra `linger` saniye beklenerek farklı
+odalardan gelen yazımlar da aynı batch'e toplanır.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+_STOP = object()
+log = logging.getLogger(__name__)
+
+
+class DbWriter:
+    def __init__(self, db_path: str, batch_size: int = 500, maxsize: int = 10000, linger: float = 0.02):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mind-reader-db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, sql: str, params: tuple, on_commit=None) -> bool:
+        return self.submit_many(sql, [params], on_commit)
+
+    def submit_many(self, sql: str, rows: list, on_commit=None) -> bool:
+        """Satırları kuyruğa bırakır; `on_commit` yazıldıktan sonra yazıcı thread'inde çağrılır."""
+        self.start()
+        try:
+            self._queue.put_nowait((sql, rows, on_commit))
+            return True
+        except queue.Full:
+            self._drop(len(rows))
+            return False
+
+    def _drop(self, count: int) -> None:
+        # Handler (hub) ve yazıcı thread'i aynı sayacı artırır.
+        with self._lock:
+            self.dropped += count
+
+    def flush(self) -> None:
+        """Kuyruktaki tüm yazımlar diske inene kadar bekler (testler/kapanış)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+
+    def _drain(self, first) -> list:
+        items = [first]
+        deadline = time.monotonic() + self.linger
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        while True:
+            items = self._drain(self._queue.get())
+            stop = any(item is _STOP for item in items)
+            batch = [item for item in items if item is not _STOP]
+            try:
+                self._write(conn, batch)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def _write(self, conn: sqlite3.Connection, batch: list) -> None:
+        if not batch:
+            return
+        groups = {}
+        for sql, rows, _ in batch:
+            groups.setdefault(sql, []).extend(rows)
+        try:
+            with conn:
+                for sql, rows in groups.items():
+                    conn.executemany(sql, rows)
+        except sqlite3.Error as exc:
+            self.errors += 1
+            log.warning("db writer batch'i başarısız (%s); öğeler tek tek yeniden deneniyor", exc)
+            self._write_each(conn, batch)
+            return
+        self.written += sum(len(rows) for rows in groups.values())
+        self.batches += 1
+        for _, _, on_commit in batch:
+            if on_commit is not None:
+                on_commit()
+
+    def _write_each(self, conn: sqlite3.Connection, batch: list) -> None:
+        """Başarısız batch'i öğe öğe, satır satır yazar; yalnızca hatalı satırlar düşer."""
+        for sql, rows, on_commit in batch:
+            written = 0
+            try:
+                with conn:
+                    for row in rows:
+                        try:
+                            conn.execute(sql, row)
+                            written += 1
+                        except sqlite3.Error as exc:
+                            self._drop(1)
+                            log.error("db writer satırı düşürüldü: %s", exc)
+            except sqlite3.Error:
+                # Commit başarısız: öğenin tamamı kayıp.
+                self._drop(written)
+                written = 0
+                log.exception("db writer commit'i başarısız")
+            self.written += written
+            if written and on_commit is not None:
+                on_commit()
+        self.batches += 1
@@ -0,0 +1,319 @@
+"""Tur girdilerinin append-only ikili kaydı ve çevrimdışı yeniden skorlama.
+
+Her kayıt 64 baytlık sabit bir numpy dtype'ıdır:
+
+- `SAMPLE`: bir oyuncunun `thought_data` örneği (tampona girenlerle aynı),
+- `ROUND_END`: `submit_round` anında tura katılan her oyuncu için bir kayıt;
+  `t` skorlama zamanı, emotion/pupil/timing oyuncunun son değerleridir
+  (penceresinde örneği olmayan oyuncular için yedek).
+
+Oyuncular isimle değil odadaki `slot` numarasıyla (her katılımda artan)
+eşlenir; aynı isimli iki oyuncu ayrı tamponlara düşer. Oda kodu tam olarak
+saklanır; ROOM_BYTES'a sığmayan ya da ASCII olmayan kodlu odalar kaydedilmez.
+
+Kayıtlar handler'larda yalnızca kuyruğa eklenir; dosyaya gerçek bir
+thread toplu olarak yazar. Dosya `max_bytes`'ı aşınca `replay.bin.1`,
+`replay.bin.2`, ... olarak döndürülür. Okuma `np.memmap` ile sabit boyutlu
+parçalar halinde yapılır; yeniden skorlama kaydı canlı sunucu gibi sırayla
+oynatır, bellek kayıt boyutuyla değil penceredeki oyuncu sayısıyla büyür.
+
+    python replay.py rescore --log replay.bin --db games.db
+    python replay.py rescore --weights 0.5 0.3 0.2   # formül denemesi
+"""
+
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from synchrony import WEIGHTS, synchrony
+from timeseries import T, SampleBuffer, windowed_features
+
+SAMPLE = 1
+ROUND_END = 2
+ROOM_BYTES = 12
+PLAYER_BYTES = 15
+
+RECORD = np.dtype(
+    [
+        ("t", "<f8"),
+        ("timing", "<f8"),
+        ("kind", "u1"),
+        ("slot", "<u4"),
+        ("room", f"S{ROOM_BYTES}"),
+        ("player", f"S{PLAYER_BYTES}"),
+        ("pupil", "<f4"),
+        ("e0", "<f4"),
+        ("e1", "<f4"),
+        ("e2", "<f4"),
+    ]
+)
+assert RECORD.itemsize == 64
+
+_STOP = object()
+# Yeniden skorlamada bir seferde Python listelerine açılan kayıt sayısı.
+CHUNK_RECORDS = 1 << 16
+
+
+def player_key(name: str) -> bytes:
+    """İsim kayıtta UTF-8 olarak PLAYER_BYTES bayta kırpılır (yalnızca bilgi amaçlı)."""
+    return name.encode("utf-8")[:PLAYER_BYTES]
+
+
+def room_fits(room_code: str) -> bool:
+    return room_code.isascii() and len(room_code) <= ROOM_BYTES
+
+
+def created_at(t: float) -> str:
+    """Tur skorlama zamanının `scores.created_at` biçimi."""
+    return datetime.utcfromtimestamp(t).isoformat()
+
+
+class ReplayLog:
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 1024,
+        maxsize: int = 100000,
+        max_bytes: int = 256 << 20,
+        backups: int = 4,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mind-reader-replay", daemon=True)
+                self._thread.start()
+
+    def _put(self, record: tuple) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def sample(self, room_code, slot, name, t, timing, pupil, e0, e1, e2) -> None:
+        if not room_fits(room_code):
+            self.skipped += 1
+            return
+        self.start()
+        self._put((t, timing, SAMPLE, slot, room_code, name, pupil, e0, e1, e2))
+
+    def round_end(self, room_code, t, players) -> None:
+        """`players`: (slot, name, emotion, pupil, timing) listesi."""
+        if not room_fits(room_code):
+            self.skipped += 1
+            return
+        self.start()
+        for slot, name, emotion, pupil, timing in players:
+            timing = np.nan if timing is None else timing
+            self._put((t, timing, ROUND_END, slot, room_code, name, pupil, *emotion))
+
+    def flush(self) -> None:
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+
+    def _rotate(self) -> None:
+        """replay.bin -> replay.bin.1 -> ... ; `backups`'tan eskisi silinir."""
+        for i in range(self.backups, 0, -1):
+            src = self.path if i == 1 else f"{self.path}.{i - 1}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i}")
+        if self.backups == 0 and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _run(self) -> None:
+        f = open(self.path, "ab")
+        try:
+            while True:
+                items = [self._queue.get()]
+                while len(items) < self.batch_size:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                records = [item for item in items if item is not _STOP]
+                if records:
+                    rows = [
+                        (t, timing, kind, slot, room.encode("ascii"), player_key(name), pupil, e0, e1, e2)
+                        for t, timing, kind, slot, room, name, pupil, e0, e1, e2 in records
+                    ]
+                    f.write(np.array(rows, dtype=RECORD).tobytes())
+                    f.flush()
+                    self.written += len(rows)
+                    if self.max_bytes and f.tell() >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "ab")
+                for _ in items:
+                    self._queue.task_done()
+                if len(records) != len(items):
+                    return
+        finally:
+            f.close()
+
+
+def open_log(path: str) -> np.ndarray:
+    """Kaydı kopyalamadan okur; yarım kalmış son kayıt yok sayılır."""
+    count = os.path.getsize(path) // RECORD.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.empty(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+
+def log_files(path: str) -> list:
+    """Döndürülmüş dosyalar dahil mevcut kayıtlar, eskiden yeniye."""
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+    return [*reversed(rotated), *([path] if os.path.exists(path) else [])]
+
+
+def _records(logs, chunk: int):
+    """Kayıtları sırayla, en fazla `chunk` kayıtlık parçaların listeleri olarak verir."""
+    for log in logs:
+        for lo in range(0, len(log), chunk):
+            part = log[lo : lo + chunk]
+            yield zip(
+                part["t"].tolist(),
+                part["timing"].tolist(),
+                part["kind"].tolist(),
+                part["slot"].tolist(),
+                part["room"].tolist(),
+                part["player"].tolist(),
+                part["pupil"].tolist(),
+                part["e0"].tolist(),
+                part["e1"].tolist(),
+                part["e2"].tolist(),
+            )
+
+
+def rescore(logs, window: float, bins: int, capacity: int, weights: tuple = WEIGHTS, chunk: int = CHUNK_RECORDS):
+    """Kayıttaki her turu yeniden skorlar: (room, t, [(player, skor)], grup skoru).
+
+    Oyuncu listesi tur sonu kayıtlarının (yani `scores` insert'lerinin) sırasındadır.
+
+    `logs` tek bir kayıt dizisi ya da (döndürülmüş dosyalar için) sıralı bir
+    listesidir. Örnekler canlı sunucudaki gibi oyuncu başına `capacity`
+    boyutlu tamponlara itilir ve her tur sonu kaydında o anki tamponlarla
+    skorlanır. Son örneği pencereden düşen tamponlar atılır; böyle bir
+    oyuncunun yedeği tur sonu kaydındaki son değerleridir (son örnekle aynı).
+    """
+    if isinstance(logs, np.ndarray):
+        logs = [logs]
+    buffers = {}
+    group = []
+
+    def score_group():
+        room, t = group[0][0], group[0][1]
+        players, bufs, fallbacks = [], [], []
+        for _room, _t, slot, player, timing, pupil, emotion in group:
+            players.append(player.decode("utf-8", "ignore"))
+            bufs.append(buffers.get((room, slot)))
+            fallbacks.append((emotion, pupil, None if np.isnan(timing) else timing))
+        emotions, pupils, timings = windowed_features(bufs, fallbacks, now=t, window=window, bins=bins)
+        result = synchrony(emotions, pupils, timings, now=t, weights=weights)
+        scores = [(name, round(float(score) * 100, 2)) for name, score in zip(players, result.players)]
+        group.clear()
+        return room.decode(), t, scores, round(result.group * 100, 2)
+
+    for part in _records(logs, chunk):
+        t = None
+        for t, timing, kind, slot, room, player, pupil, e0, e1, e2 in part:
+            if kind == ROUND_END:
+                if group and (group[0][0] != room or group[0][1] != t):
+                    yield score_group()
+                group.append((room, t, slot, player, timing, pupil, (e0, e1, e2)))
+                continue
+            if group:
+                yield score_group()
+            buf = buffers.get((room, slot))
+            if buf is None:
+                buf = buffers[(room, slot)] = SampleBuffer(capacity)
+            buf.push(t, timing, pupil, e0, e1, e2)
+        if t is not None:
+            # Son örneği pencerenin dışında kalan tamponlar bir daha okunmaz.
+            horizon = t - window
+            for key in [key for key, buf in buffers.items() if buf.latest()[T] < horizon]:
+                del buffers[key]
+    if group:
+        yield score_group()
+
+
+def load_stored_scores(db_path: str) -> dict:
+    """(room_code, created_at) -> insert sırasıyla [(kırpılmış oyuncu adı, skor)]."""
+    conn = sqlite3.connect(db_path)
+    stored = {}
+    for room_code, name, score, created in conn.execute(
+        "SELECT room_code, player_name, score, created_at FROM scores ORDER BY id"
+    ):
+        stored.setdefault((room_code, created), []).append((player_key(name).decode("utf-8", "ignore"), score))
+    conn.close()
+    return stored
+
+
+def compare(log_path: str, db_path: str, window: float, bins: int, capacity: int, weights: tuple) -> dict:
+    """`log_path` ve döndürülmüş eski dosyalarını `scores` tablosuyla karşılaştırır."""
+    stored = load_stored_scores(db_path)
+    diffs = []
+    rounds = missing = 0
+    logs = [open_log(path) for path in log_files(log_path)]
+    for room, t, players, _group in rescore(logs, window, bins, capacity, weights):
+        rounds += 1
+        saved = stored.get((room, created_at(t)))
+        # Aynı isimli oyuncular olabildiğinden eşleme sıra ile yapılır; isimler yalnızca kontrol.
+        if saved is None or [name for name, _ in saved] != [name for name, _ in players]:
+            missing += 1
+            continue
+        diffs.extend(abs(score - saved_score) for (_, score), (_, saved_score) in zip(players, saved))
+    diffs = np.asarray(diffs)
+    return {
+        "rounds": rounds,
+        "missing": missing,
+        "players": int(diffs.size),
+        "meanAbsDiff": round(float(diffs.mean()), 4) if diffs.size else 0.0,
+        "maxAbsDiff": round(float(diffs.max()), 4) if diffs.size else 0.0,
+        "changed": int((diffs > 0.01).sum()),
+    }
+
+
+def main() -> None:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("rescore", help="kaydı yeniden skorla ve scores tablosuyla karşılaştır")
+    cmd.add_argument("--log", default=os.path.join(base_dir, "replay.bin"))
+    cmd.add_argument("--db", default=os.path.join(base_dir, "games.db"))
+    cmd.add_argument("--window", type=float, default=float(os.environ.get("SYNC_WINDOW", "10")))
+    cmd.add_argument("--bins", type=int, default=20)
+    cmd.add_argument("--capacity", type=int, default=int(os.environ.get("THOUGHT_BUFFER_SIZE", "256")))
+    cmd.add_argument("--weights", type=float, nargs=3, default=list(WEIGHTS), metavar=("EMOTION", "PUPIL", "TIMING"))
+    args = parser.parse_args()
+
+    summary = compare(args.log, args.db, args.window, args.bins, args.capacity, tuple(args.weights))
+    for key, value in summary.items():
+        print(f"{key:>12}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Çakışmasız 6 karakterlik oda kodu üretimi.
+
+36^6 (A-Z0-9) kod uzayı, anahtarlı bir Feistel permütasyonuyla karıştırılmış
+bir sayaçtan dağıtılır: sayaç hiçbir zaman tekrar etmediği için üretilen
+kodlar da tekrar etmez ve tahmin edilebilir sırada değildir. Önceki
+çalıştırmalardan kalan kodlar açılışta DB'den bir kez `taken` kümesine
+yüklenir; kod üretimi diske hiç gitmez.
+"""
+
+import hashlib
+import os
+import string
+import threading
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+SPACE = len(ALPHABET) ** CODE_LENGTH  # 2_176_782_336 < 2^32
+HALF_BITS = 16
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def encode(n: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, r = divmod(n, len(ALPHABET))
+        chars.append(ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+class RoomCodeAllocator:
+    def __init__(self, key: bytes | None = None):
+        key = key or os.urandom(16)
+        self._round_keys = [hashlib.blake2b(key + bytes([i]), digest_size=8).digest() for i in range(ROUNDS)]
+        self._counter = int.from_bytes(os.urandom(4), "big") % SPACE
+        self._issued = 0
+        self._taken = set()
+        self._lock = threading.Lock()
+
+    def _round(self, value: int, i: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(2, "big"), key=self._round_keys[i], digest_size=2).digest()
+        return int.from_bytes(digest, "big")
+
+    def _feistel(self, n: int) -> int:
+        left, right = n >> HALF_BITS, n & HALF_MASK
+        for i in range(ROUNDS):
+            left, right = right, left ^ self._round(right, i)
+        return (left << HALF_BITS) | right
+
+    def permute(self, n: int) -> int:
+        """[0, SPACE) içinde birebir eşleme (32 bit Feistel + cycle walking)."""
+        n = self._feistel(n)
+        while n >= SPACE:
+            n = self._feistel(n)
+        return n
+
+    def warm(self, codes) -> None:
+        with self._lock:
+            self._taken.update(codes)
+
+    def allocate(self, in_use=()) -> str:
+        """Daha önce verilmemiş ve `in_use` içinde olmayan yeni bir kod."""
+        with self._lock:
+            while True:
+                if self._issued >= SPACE:
+                    raise RuntimeError("room code space exhausted")
+                code = encode(self.permute(self._counter))
+                self._counter = (self._counter + 1) % SPACE
+                self._issued += 1
+                if code not in self._taken and code not in in_use:
+                    self._taken.add(code)
+                    return code
+
+    def __len__(self) -> int:
+        return len(self._taken)
@@ -2,7 +2,19 @@ window.App = window.App || {};
 (() => {
   const socketReady = () => App.state?.socket;
   let timer = null;
+  let streamTimer = null;
   let secs = 30;
+  // Tur boyunca sunucu penceresi için saniyede 4 örnek gönderilir.
+  const STREAM_INTERVAL_MS = 250;
+
+  const sendThought = () => {
+    App.state.socket.emit('thought_data', {
+      room_code: App.state.roomCode,
+      emotion: App.currentEmotion,
+      pupil: App.currentPupil,
+      timing: Date.now() / 1000
+    });
+  };
 
   const refreshBoards = async () => {
     if (!App.state.roomCode) return;
@@ -26,17 +38,15 @@ window.App = window.App || {};
     secs = 30;
     document.getElementById('status').textContent = `Durum: ${document.getElementById('category').value} düşün!`;
     clearInterval(timer);
+    clearInterval(streamTimer);
+    streamTimer = setInterval(sendThought, STREAM_INTERVAL_MS);
     timer = setInterval(() => {
       secs -= 1;
       document.getElementById('timer').textContent = secs;
       if (secs <= 0) {
         clearInterval(timer);
-        App.state.socket.emit('thought_data', {
-          room_code: App.state.roomCode,
-          emotion: App.currentEmotion,
-          pupil: App.currentPupil,
-          timing: Date.now() / 1000
-        });
+        clearInterval(streamTimer);
+        sendThought();
       }
     }, 1000);
   };
@@ -71,7 +81,10 @@ window.App = window.App || {};
     });
 
     App.state.socket.on('round_result', data => {
-      document.getElementById('score').textContent = `Telepati uyumu: %${data.group_score}`;
+      const me = App.state.players.find(p => p.sid === App.state.mySid);
+      document.getElementById('score').textContent = me
+        ? `Telepati uyumu: %${data.group_score} (senin uyumun: %${me.score})`
+        : `Telepati uyumu: %${data.group_score}`;
       document.getElementById('status').textContent = `${data.category} turu bitti!`;
       refreshBoards();
 
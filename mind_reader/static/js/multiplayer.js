@@ -12,7 +12,8 @@ window.App = window.App || {};
     role: 'player',
     name: 'Anon',
     localStream: null,
-    players: []
+    players: [],
+    seq: 0
   };
 
   App.addVideo = (sid, stream, label) => {
@@ -48,11 +49,42 @@ window.App = window.App || {};
 
   socket.on('join_error', d => alert(d.message));
 
-  socket.on('room_state', data => {
+  // Oda durumu: katılınca tek snapshot, sonra sıra numaralı küçük delta'lar.
+  socket.on('room_snapshot', data => {
+    App.state.seq = data.seq;
+    App.state.spectatorCount = data.spectator_count;
     App.rebuildPlayers(data.players);
     App.refreshBoards();
   });
 
+  const applyOp = (players, op) => {
+    switch (op.op) {
+      case 'player_added':
+        return [...players.filter(p => p.sid !== op.player.sid), op.player];
+      case 'player_removed':
+        return players.filter(p => p.sid !== op.sid);
+      case 'player_changed':
+        return players.map(p => (p.sid === op.sid ? { ...p, ...op.fields } : p));
+      case 'spectators':
+        App.state.spectatorCount = op.count;
+        return players;
+      default:
+        return players;
+    }
+  };
+
+  socket.on('room_delta', ({ seq, ops }) => {
+    if (seq <= App.state.seq) return;
+    if (seq !== App.state.seq + 1) {
+      // Araya kaçan delta var; tam durumu yeniden iste.
+      socket.emit('resync');
+      return;
+    }
+    App.state.seq = seq;
+    App.rebuildPlayers(ops.reduce(applyOp, App.state.players));
+    if (ops.some(op => op.op === 'player_added' || op.op === 'player_removed')) App.refreshBoards();
+  });
+
   socket.on('signal', ({ from, signal }) => {
     if (!peers[from]) {
       const peer = new SimplePeer({ initiator: false, trickle: false, stream: App.state.localStream || undefined });
@@ -66,15 +98,18 @@ window.App = window.App || {};
     peers[from].signal(signal);
   });
 
-  socket.on('reaction', ({ from, emoji }) => {
+  const showReaction = ({ from, emoji, count }) => {
     const card = document.getElementById(`card-${from}`) || document.getElementById(`card-${App.state.mySid}`);
     if (!card) return;
     const bubble = document.createElement('div');
     bubble.className = 'reaction-bubble';
-    bubble.textContent = emoji;
+    bubble.textContent = count > 1 ? `${emoji}×${count}` : emoji;
     card.appendChild(bubble);
     setTimeout(() => bubble.remove(), 900);
-  });
+  };
+
+  // Sunucu reaksiyonları oda başına birleştirip periyodik olarak gönderir.
+  socket.on('reactions', ({ items }) => items.forEach(showReaction));
 
   App.joinRoom = (role='player') => {
     const room_code = document.getElementById('roomCode').value.trim().toUpperCase();
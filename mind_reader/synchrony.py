@@ -0,0 +1,76 @@
+"""Oyuncular arası telepati (senkron) skorunun vektörel hesabı.
+
+Tüm oyuncuların emotion vektörleri, pupil ve timing değerleri dizilere
+yığılır; korelasyon ve senkron matrisleri tek geçişte hesaplanır:
+
+    Uyum = (emotion_correlation × 0.6) + (pupil_sync × 0.2) + (timing_sync × 0.2)
+
+4 oyunculu odalar kadar yüzlerce kişilik "audience mode" odaları için de
+maliyet O(n² · k) numpy işlemidir; Python döngüsü yoktur.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+EMOTION_WEIGHT = 0.6
+PUPIL_WEIGHT = 0.2
+TIMING_WEIGHT = 0.2
+# Bu kadar saniye ve üzeri gönderim farkı timing_sync = 0 demektir.
+TIMING_WINDOW = 5.0
+
+
+@dataclass
+class SynchronyResult:
+    matrix: np.ndarray  # (n, n) çift skorları, köşegen 1
+    players: np.ndarray  # (n,) her oyuncunun diğerleriyle ortalama skoru
+    group: float  # tüm çiftlerin ortalaması
+
+    def pairs(self) -> list:
+        """Üst üçgendeki (i, j, skor) üçlüleri."""
+        i, j = np.triu_indices(len(self.matrix), k=1)
+        return list(zip(i.tolist(), j.tolist(), self.matrix[i, j].tolist()))
+
+
+def emotion_correlation(emotions: np.ndarray) -> np.ndarray:
+    """Satırlar arası Pearson korelasyon matrisi; sabit vektörler için 0."""
+    centered = emotions - emotions.mean(axis=1, keepdims=True)
+    norms = np.sqrt((centered * centered).sum(axis=1))
+    denom = np.outer(norms, norms)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.where(denom > 0, (centered @ centered.T) / denom, 0.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+WEIGHTS = (EMOTION_WEIGHT, PUPIL_WEIGHT, TIMING_WEIGHT)
+
+
+def synchrony(emotions, pupils, timings, now: float | None = None, weights: tuple = WEIGHTS) -> SynchronyResult:
+    """Tüm çiftler için senkron matrisini ve oyuncu/grup skorlarını hesaplar.
+
+    `emotions` (n, k), `pupils` (n,), `timings` (n,) boyutludur. Eksik timing
+    değerleri (None/NaN) en geç gönderim zamanıyla doldurulur. `weights`
+    (emotion, pupil, timing) ağırlıklarıdır; replay ile formül denemek için.
+    """
+    emotions = np.asarray(emotions, dtype=np.float64)
+    pupils = np.asarray(pupils, dtype=np.float64)
+    timings = np.asarray([np.nan if t is None else t for t in timings], dtype=np.float64)
+    n = len(emotions)
+    if n < 2:
+        return SynchronyResult(np.ones((n, n)), np.zeros(n), 0.0)
+
+    if np.isnan(timings).all():
+        timings[:] = 0.0 if now is None else now
+    else:
+        timings = np.where(np.isnan(timings), np.nanmax(timings), timings)
+
+    emotion_c = (emotion_correlation(emotions) + 1) / 2
+    pupil_sync = 1 - np.minimum(1, np.abs(pupils[:, None] - pupils[None, :]))
+    timing_sync = 1 - np.minimum(1, np.abs(timings[:, None] - timings[None, :]) / TIMING_WINDOW)
+    w_emotion, w_pupil, w_timing = weights
+    matrix = w_emotion * emotion_c + w_pupil * pupil_sync + w_timing * timing_sync
+    np.fill_diagonal(matrix, 1.0)
+
+    players = (matrix.sum(axis=1) - 1.0) / (n - 1)
+    group = float(matrix[np.triu_indices(n, k=1)].mean())
+    return SynchronyResult(matrix, players, group)
@@ -0,0 +1,56 @@
+"""`thought_data` doğrulaması için regresyon testleri.
+
+    python -m pytest test_thought_data.py
+"""
+
+import math
+import os
+import tempfile
+
+import pytest
+
+import app as mind_reader
+from synchrony import synchrony
+from timeseries import windowed_features
+
+mind_reader.DB_PATH = os.path.join(tempfile.mkdtemp(), "games.db")
+mind_reader.db_writer.db_path = mind_reader.DB_PATH
+mind_reader.init_db()
+
+
+def join(room_code, name):
+    client = mind_reader.socketio.test_client(mind_reader.app)
+    client.emit("join_room", {"room_code": room_code, "name": name})
+    return client
+
+
+def room_scores(room_code, now):
+    players = list(mind_reader.rooms[room_code]["players"].items())
+    fallbacks = [(p["emotion"], p["pupil"], p["timing"]) for _, p in players]
+    emotions, pupils, timings = windowed_features(
+        [mind_reader.player_buffers[sid] for sid, _ in players],
+        fallbacks,
+        now=now,
+        window=mind_reader.SYNC_WINDOW,
+        bins=mind_reader.SYNC_BINS,
+    )
+    return synchrony(emotions, pupils, timings, now=now).players.tolist()
+
+
+def test_non_finite_sample_does_not_change_scores():
+    room_code = mind_reader.app.test_client().post("/api/create_room", json={"name": "a"}).get_json()["room_code"]
+    a, b = join(room_code, "a"), join(room_code, "b")
+    sample = {"emotion": [0.7, 0.2, 0.1], "pupil": 0.4, "timing": 1000.0}
+    a.emit("thought_data", sample)
+    b.emit("thought_data", {"emotion": [0.1, 0.3, 0.6], "pupil": 0.6, "timing": 1001.0})
+    now = max(buf.latest()[0] for buf in mind_reader.player_buffers.values() if buf.count)
+    before = room_scores(room_code, now)
+
+    a.emit("thought_data", {**sample, "pupil": "nan"})
+    a.emit("thought_data", {**sample, "emotion": [float("inf"), 0.2, 0.1], "timing": "-inf"})
+
+    after = room_scores(room_code, now)
+    assert all(math.isfinite(score) for score in after)
+    assert after == pytest.approx(before)
+    player = next(p for p in mind_reader.rooms[room_code]["players"].values() if p["name"] == "a")
+    assert player["pupil"] == 0.4 and player["emotion"] == sample["emotion"]
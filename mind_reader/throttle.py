@@ -0,0 +1,77 @@
+"""Socket event'leri için sid başına hız sınırı ve reaksiyon birleştirme.
+
+Hızlı bir istemci (webcam/EEG akışı ya da emoji spam'i) eventlet döngüsünü
+ve odanın geri kalanını yavaşlatmasın diye her event tipi için sid başına
+token bucket uygulanır. Reaksiyonlar anında yeniden yayınlanmaz; oda
+başına biriktirilip periyodik tek bir `reactions` mesajıyla gönderilir.
+"""
+
+import time
+from collections import Counter
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter:
+    """sid -> event -> TokenBucket; reddedilen mesajlar `counters`'a yazılır."""
+
+    def __init__(self, limits: dict, counters: Counter):
+        self.limits = limits  # event -> (rate, burst)
+        self.counters = counters
+        self._buckets = {}
+
+    def allow(self, sid: str, event: str) -> bool:
+        buckets = self._buckets.setdefault(sid, {})
+        bucket = buckets.get(event)
+        if bucket is None:
+            bucket = buckets[event] = TokenBucket(*self.limits[event])
+        if bucket.allow():
+            return True
+        self.counters[f"dropped.{event}"] += 1
+        return False
+
+    def forget(self, sid: str) -> None:
+        self._buckets.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ReactionCoalescer:
+    """Oda başına bekleyen reaksiyonları (from, emoji) -> adet olarak tutar."""
+
+    def __init__(self, counters: Counter):
+        self.counters = counters
+        self._pending = {}
+
+    def add(self, room_code: str, sender: str, emoji: str) -> None:
+        pending = self._pending.setdefault(room_code, Counter())
+        key = (sender, emoji)
+        if key in pending:
+            self.counters["coalesced.reaction"] += 1
+        pending[key] += 1
+
+    def drain(self) -> dict:
+        """Bekleyenleri boşaltır: room_code -> [{"from", "emoji", "count"}]."""
+        pending, self._pending = self._pending, {}
+        return {
+            room_code: [{"from": sender, "emoji": emoji, "count": n} for (sender, emoji), n in items.items()]
+            for room_code, items in pending.items()
+        }
@@ -0,0 +1,107 @@
+"""Oyuncu başına sabit boyutlu `thought_data` örnek tamponları.
+
+Her oyuncu için açılışta bir kez ayrılan (capacity, 6) float64 halka tampon
+tutulur; istemci ne kadar hızlı gönderirse göndersin bellek sabittir ve
+`push` yalnızca skaler atama yapar (örnek başına dizi ayrılmaz). Skorlama
+anında son `window` saniyedeki örnekler zamana göre kovalara bölünür ve
+oyuncular arası senkron bu pencereli seriler üzerinden hesaplanır.
+"""
+
+import numpy as np
+
+# Kolon sırası: sunucu zamanı, istemci timing'i, pupil, 3 emotion bileşeni.
+T, TIMING, PUPIL, EMOTION = 0, 1, 2, slice(3, 6)
+FIELD_COUNT = 6
+
+
+class SampleBuffer:
+    __slots__ = ("data", "capacity", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros((capacity, FIELD_COUNT), dtype=np.float64)
+        self.data[:, TIMING] = np.nan
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+
+    def push(self, t: float, timing: float, pupil: float, e0: float, e1: float, e2: float) -> None:
+        d, i = self.data, self.head
+        d[i, 0] = t
+        d[i, 1] = timing
+        d[i, 2] = pupil
+        d[i, 3] = e0
+        d[i, 4] = e1
+        d[i, 5] = e2
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def ordered(self) -> np.ndarray:
+        """Örnekler eskiden yeniye (dolu tamponda bir kopya)."""
+        if self.count < self.capacity:
+            return self.data[: self.count]
+        return np.concatenate((self.data[self.head :], self.data[: self.head]))
+
+    def latest(self) -> np.ndarray | None:
+        if not self.count:
+            return None
+        return self.data[(self.head - 1) % self.capacity]
+
+    def window(self, since: float) -> np.ndarray:
+        rows = self.ordered()
+        return rows[rows[:, T] >= since]
+
+
+def binned_emotions(rows: np.ndarray, start: float, window: float, bins: int) -> np.ndarray:
+    """Penceredeki emotion örneklerini `bins` eşit zaman kovasında ortalar.
+
+    Boş kovalar penceredeki ortalamayla doldurulur; sonuç (bins * 3,) seridir.
+    """
+    idx = np.clip(((rows[:, T] - start) / window * bins).astype(np.int64), 0, bins - 1)
+    counts = np.bincount(idx, minlength=bins)
+    emotions = rows[:, EMOTION]
+    series = np.empty((bins, 3))
+    for c in range(3):
+        sums = np.bincount(idx, weights=emotions[:, c], minlength=bins)
+        series[:, c] = np.where(counts > 0, sums / np.maximum(counts, 1), emotions[:, c].mean())
+    return series.ravel()
+
+
+def windowed_features(buffers: list, fallbacks: list, now: float, window: float, bins: int) -> tuple:
+    """Oyuncuların tamponlarındaki son `window` saniyeden senkron girdilerini üretir.
+
+    `fallbacks`, hiç örneği olmayan oyuncular için (emotion, pupil, timing)
+    üçlüleridir; örneği olan ama penceresi boş oyuncular son örneklerine düşer.
+    """
+    start = now - window
+    rows, resolved = [], []
+    for buf, fallback in zip(buffers, fallbacks):
+        last = buf.latest() if buf is not None else None
+        if last is not None:
+            fallback = (last[EMOTION], last[PUPIL], last[TIMING])
+        rows.append(buf.window(start) if buf is not None else None)
+        resolved.append(fallback)
+    return features(rows, resolved, start, window, bins)
+
+
+def features(rows_list: list, fallbacks: list, start: float, window: float, bins: int) -> tuple:
+    """Pencere satırlarından (tampon kolon düzeninde) senkron girdileri.
+
+    Dönüş: emotion serileri (n, bins * 3), pupil ortalamaları (n,) ve son
+    istemci timing'leri (n,). Canlı skorlama ve replay aynı fonksiyonu
+    kullanır.
+    """
+    n = len(rows_list)
+    series = np.empty((n, bins * 3))
+    pupils = np.empty(n)
+    timings = np.full(n, np.nan)
+    for i, (rows, (emotion, pupil, timing)) in enumerate(zip(rows_list, fallbacks)):
+        if rows is not None and len(rows):
+            series[i] = binned_emotions(rows, start, window, bins)
+            pupils[i] = rows[:, PUPIL].mean()
+            timings[i] = rows[-1, TIMING]
+            continue
+        series[i] = np.tile(emotion, bins)
+        pupils[i] = pupil
+        timings[i] = np.nan if timing is None else timing
+    return series, pupils, timings